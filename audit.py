@@ -1,12 +1,47 @@
-from models.s3bucket import S3Bucket
-from models.gcpbucket import GCPBucket
-from models.azblob import AZBlob
+import time
+started = time.perf_counter()
+
 from utils.cprint import cprint
+from utils.report import Report
+from utils.loader import Loader
+from utils.cache import SnapshotCache
+from utils.snapshot import Snapshot, SnapshotMiss
+from utils.fetcher import Fetcher
+from utils.scheduler import Scheduler
+from utils.checkpoint import Checkpoint
+from utils.daemon import Daemon, FindingsServer, FindingsState, Target
+from utils.findings import FindingsStore
+from utils.report import Finding
+from utils.journal import Journal
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from typing import Any, Optional
 import argparse
+import importlib
+import io
 import json
 import os
+import threading
 
 platforms = ['aws', 'gcp', 'az']
+providers = {'aws': ('models.s3bucket', 'S3Bucket'), 'gcp': ('models.gcpbucket', 'GCPBucket'), 'az': ('models.azblob', 'AZBlob')}
+provider_lock = threading.Lock()
+startup_times = {'audit': time.perf_counter() - started}
+
+
+def load_provider(platform: str) -> Any:
+    module_name, class_name = providers[platform]
+    with provider_lock:
+        if platform not in startup_times:
+            loading = time.perf_counter()
+            importlib.import_module(module_name)
+            startup_times[platform] = time.perf_counter() - loading
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def profile_startup() -> None:
+    timings = ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in startup_times.items())
+    cprint(f"Startup: {sum(startup_times.values()) * 1000:.0f} ms ({timings})", info=True)
 
 
 def read_creds(file_path: str = "") -> dict[str, str]:
@@ -20,44 +55,236 @@ def read_creds(file_path: str = "") -> dict[str, str]:
     return creds
 
 
-def init_s3bucket(args: argparse.Namespace) -> None:
+def check_options(args: argparse.Namespace) -> dict[str, Any]:
+    return {'checks': args.checks, 'skip_checks': args.skip_checks}
+
+
+def object_scan_options(args: argparse.Namespace) -> dict[str, Any]:
+    return {'scan_objects': args.scan_objects, 'max_objects': args.max_objects, 'sample_rate': args.sample_rate, 'scan_state': args.scan_checkpoint}
+
+
+def init_s3bucket(args: argparse.Namespace, report: Report, fetcher: Fetcher) -> Any:
+    S3Bucket = load_provider('aws')
     if args.aws_creds_path:
         creds = read_creds(file_path=args.aws_creds_path)
         if creds and all(key in creds for key in ['access_key_id', 'secret_access_key']):
-            bucket = S3Bucket(bucket_name=args.bucket_name, aws_access_key_id=creds['access_key_id'], aws_secret_access_key=creds['secret_access_key'])
+            bucket = S3Bucket(bucket_name=args.bucket_name, aws_access_key_id=creds['access_key_id'], aws_secret_access_key=creds['secret_access_key'], workers=args.workers, report=report, fetcher=fetcher, **object_scan_options(args), **check_options(args))
         else:
             cprint('Invalid Credential Keys in JSON File', error=True)
-            return
+            return None
     elif args.aws_creds:
-        bucket = S3Bucket(bucket_name=args.bucket_name, aws_access_key_id=args.aws_creds[0], aws_secret_access_key=args.aws_creds[1])
+        bucket = S3Bucket(bucket_name=args.bucket_name, aws_access_key_id=args.aws_creds[0], aws_secret_access_key=args.aws_creds[1], workers=args.workers, report=report, fetcher=fetcher, **object_scan_options(args), **check_options(args))
     else:
-        bucket = S3Bucket(bucket_name=args.bucket_name)
-    bucket.start()
+        bucket = S3Bucket(bucket_name=args.bucket_name, workers=args.workers, report=report, fetcher=fetcher, **object_scan_options(args), **check_options(args))
+    return bucket
 
 
-def init_gcpbucket(args: argparse.Namespace) -> None:
-    if args.gcp_creds:
-        bucket = GCPBucket(bucket_name=args.bucket_name, cred_file_path=args.gcp_creds)
+def init_gcpbucket(args: argparse.Namespace, report: Report, fetcher: Fetcher) -> Any:
+    GCPBucket = load_provider('gcp')
+    if args.gcp_creds or args.replay:
+        bucket = GCPBucket(bucket_name=args.bucket_name, cred_file_path=args.gcp_creds, report=report, probe_concurrency=args.probe_concurrency, timeout=args.timeout, fetcher=fetcher, **check_options(args))
     else:
         cprint("No GCP Credentials Specified!", error=True)
-        return
-    bucket.start()
+        return None
+    return bucket
 
 
-def init_azblob(args: argparse.Namespace) -> None:
+def init_azblob(args: argparse.Namespace, report: Report, fetcher: Fetcher) -> Any:
+    AZBlob = load_provider('az')
     if args.az_creds_path:
         creds = read_creds(file_path=args.az_creds_path)
         if creds and all(key in creds for key in ['tenant_id', 'client_id', 'client_secret', 'subscription_id']):
-            blob = AZBlob(container_name=args.bucket_name, storage_acct_name=args.storage_acct_name, tenant_id=creds['tenant_id'], client_id=creds['client_id'], client_secret=creds['client_secret'], subscription_id=creds['subscription_id'])
+            blob = AZBlob(container_name=args.bucket_name, storage_acct_name=args.storage_acct_name, tenant_id=creds['tenant_id'], client_id=creds['client_id'], client_secret=creds['client_secret'], subscription_id=creds['subscription_id'], report=report, fetcher=fetcher, workers=args.workers, **check_options(args))
         else:
             cprint('Invalid Credential Keys in JSON File', error=True)
-            return
+            return None
     elif args.az_creds:
-        blob = AZBlob(container_name=args.bucket_name, storage_acct_name=args.storage_acct_name, tenant_id=args.az_creds[0], client_id=args.az_creds[1], client_secret=args.az_creds[2], subscription_id=args.az_creds[3])
+        blob = AZBlob(container_name=args.bucket_name, storage_acct_name=args.storage_acct_name, tenant_id=args.az_creds[0], client_id=args.az_creds[1], client_secret=args.az_creds[2], subscription_id=args.az_creds[3], report=report, fetcher=fetcher, workers=args.workers, **check_options(args))
+    elif args.replay:
+        blob = AZBlob(container_name=args.bucket_name, storage_acct_name=args.storage_acct_name, report=report, fetcher=fetcher, workers=args.workers, **check_options(args))
     else:
         cprint("No Azure Credentials Specified!", error=True)
+        return None
+    return blob
+
+
+def read_manifest(file_path: str = "") -> list[dict[str, str]]:
+    targets = list[dict[str, str]]()
+    try:
+        targets = json.loads(open(file_path, 'r').read())
+    except json.JSONDecodeError:
+        cprint("Invalid Manifest File (Expected a JSON List of Targets)", error=True)
+    except FileNotFoundError:
+        cprint("Invalid Manifest Path (Enclose in double quotes if path contains spaces)", error=True)
+    return [target for target in targets if target.get('platform') in platforms]
+
+
+def init_target(args: argparse.Namespace, target: dict[str, str], report: Report, fetcher: Fetcher) -> Any:
+    target_args = argparse.Namespace(**vars(args))
+    target_args.platform = target['platform']
+    target_args.bucket_name = target.get('bucket_name', '')
+    target_args.storage_acct_name = target.get('storage_acct_name', '')
+    target_args.aws_creds = target_args.az_creds = ''
+    target_args.aws_creds_path = target_args.gcp_creds = target_args.az_creds_path = target.get('creds', '')
+    return initializers[target_args.platform](target_args, report, fetcher)
+
+
+def run_target(args: argparse.Namespace, target: dict[str, str], report: Report, fetcher: Fetcher) -> None:
+    auditor = init_target(args, target, report, fetcher)
+    if auditor is not None:
+        auditor.start()
+
+
+def target_name(target: dict[str, str], index: int) -> str:
+    return target.get('name') or f"{target['platform']}-{index}"
+
+
+def init_manifest(args: argparse.Namespace, report: Report, fetcher: Fetcher) -> None:
+    targets = read_manifest(file_path=args.manifest)
+    if not targets:
+        cprint("No Valid Targets in Manifest", error=True)
         return
-    blob.start()
+
+    cprint(f"Auditing {len(targets)} Targets with {args.manifest_workers} Workers", info=True)
+    with ThreadPoolExecutor(max_workers=max(1, args.manifest_workers)) as executor:
+        futures = dict[Future[None], str]()
+        for index, target in enumerate(targets):
+            name = target_name(target, index)
+            futures[executor.submit(run_target, args, target, report.scoped(name), fetcher.scoped(name))] = name
+        for future in as_completed(futures):
+            try:
+                future.result()
+                cprint(f"Finished Auditing {futures[future]}", success=True)
+            except Exception as e:
+                cprint(f"Error Auditing {futures[future]}: {e}", error=True)
+
+
+def init_daemon(args: argparse.Namespace, report: Report, fetcher: Fetcher) -> None:
+    if args.manifest:
+        targets = list[Target]()
+        for index, target in enumerate(read_manifest(file_path=args.manifest)):
+            name = target_name(target, index)
+            targets.append(Target(name, target['platform'], init_target(args, target, report.scoped(name), fetcher.scoped(name))))
+    else:
+        targets = [Target('', args.platform, initializers[args.platform](args, report, fetcher))]
+    targets = [target for target in targets if target.auditor is not None and target.auditor.validate_creds()]
+    if not targets:
+        cprint("No Targets with Valid Credentials", error=True)
+        return
+
+    state = FindingsState()
+    report.listeners.append(state.add)
+    host, _, port = args.listen.rpartition(':')
+    server = FindingsServer(state, fetcher.scheduler, host=host or '127.0.0.1', port=int(port))
+    server.start()
+    cprint(f"Serving Findings at http://{host or '127.0.0.1'}:{port}/findings, Re-Auditing every {args.interval:g}s", info=True)
+    daemon = Daemon(targets, state, interval=args.interval, workers=args.manifest_workers if args.manifest else 1)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        cprint("Stopping Daemon", info=True)
+    finally:
+        server.close()
+
+
+initializers = {'aws': init_s3bucket, 'gcp': init_gcpbucket, 'az': init_azblob}
+shard_auditor: Any = None
+shard_findings = list[Finding]()
+
+
+def init_shard_worker(args: argparse.Namespace) -> None:
+    global shard_auditor
+    Loader.headless = True
+    Loader.muted = args.diff
+    report = Report()
+    report.streaming = False
+    report.listeners.append(shard_findings.append)
+    scheduler = Scheduler(rate=args.rate / args.shards, max_concurrency=args.max_concurrency, retries=args.retries)
+    fetcher = Fetcher(cache=SnapshotCache(cache_dir=args.cache_dir, ttl=args.cache_ttl, incremental=args.incremental), scheduler=scheduler)
+    shard_auditor = initializers[args.platform](args, report, fetcher)
+    if shard_auditor is None or not shard_auditor.validate_creds():
+        raise RuntimeError("Error in Credentials")
+
+
+def run_shard(shard: int, entries: list[tuple[str, Any]], checkpoint_dir: str) -> list[tuple[str, str, list[Finding]]]:
+    journal = Journal(checkpoint_dir, str(shard))
+    results = list[tuple[str, str, list[Finding]]]()
+    try:
+        shard_auditor.load_shard(entries)
+        for name, _ in entries:
+            shard_findings.clear()
+            output = io.StringIO()
+            with redirect_stdout(output):
+                shard_auditor.audit_resource(name)
+            journal.append(name, shard_findings)
+            results.append((name, output.getvalue(), list(shard_findings)))
+    finally:
+        journal.close()
+    return results
+
+
+def init_sharded(args: argparse.Namespace, report: Report, fetcher: Fetcher) -> None:
+    auditor = initializers[args.platform](args, report, fetcher)
+    if auditor is None or not auditor.validate_creds():
+        cprint("Error in Credentials", error=True)
+        return
+
+    checkpoint_dir = args.checkpoint_dir or os.path.join(args.cache_dir or '.', 'checkpoints')
+    params = {'platform': args.platform, 'bucket_name': args.bucket_name, 'storage_acct_name': args.storage_acct_name, 'checks': sorted(args.checks), 'skip_checks': sorted(args.skip_checks), 'scan_objects': args.scan_objects}
+    if args.resume and not Journal.matches(checkpoint_dir, params):
+        cprint("Checkpoint belongs to a Run with a Different Platform, Target or Checks, Not Resuming", error=True)
+        return
+    completed = Journal.completed(checkpoint_dir) if args.resume else dict[str, list[Finding]]()
+    if not args.resume:
+        Journal.clear(checkpoint_dir)
+    Journal.begin(checkpoint_dir, params)
+    for findings in completed.values():
+        for finding in findings:
+            report.add(finding)
+
+    entries = [(name, metadata) for name, metadata in auditor.inventory_entries() if name not in completed]
+    shards = [entries[index:index + args.shard_size] for index in range(0, len(entries), max(1, args.shard_size))]
+    if not Loader.muted:
+        if completed:
+            cprint(f"Resuming: {len(completed)} Resources Already Audited", info=True)
+        cprint(f"Auditing {len(entries)} Resources in {len(shards)} Shards with {args.shards} Processes", info=True)
+
+    shard_args = argparse.Namespace(**vars(args))
+    shard_args.scan_checkpoint = None
+    with ProcessPoolExecutor(max_workers=args.shards, initializer=init_shard_worker, initargs=(shard_args, )) as executor:
+        futures = [executor.submit(run_shard, index, shard, checkpoint_dir) for index, shard in enumerate(shards)]
+        for future in as_completed(futures):
+            for name, output, findings in future.result():
+                print(output, end='', flush=True)
+                for finding in findings:
+                    report.add(finding)
+    Journal.clear(checkpoint_dir)
+
+
+def resource_prefix(platform: str, bucket_name: str = "", storage_acct_name: str = "") -> Optional[str]:
+    if platform != 'az':
+        return bucket_name
+    if bucket_name and not storage_acct_name:
+        return None
+    return f'{storage_acct_name}/{bucket_name}' if bucket_name else storage_acct_name
+
+
+def diff_scopes(args: argparse.Namespace) -> dict[tuple[str, str], str]:
+    scopes = dict[tuple[str, str], Optional[str]]()
+    if args.manifest:
+        for index, target in enumerate(read_manifest(file_path=args.manifest)):
+            scopes[(target_name(target, index), target['platform'])] = resource_prefix(target['platform'], target.get('bucket_name', ''), target.get('storage_acct_name', ''))
+    else:
+        scopes[('', args.platform)] = resource_prefix(args.platform, args.bucket_name, args.storage_acct_name)
+    return {scope: prefix for scope, prefix in scopes.items() if prefix is not None}
+
+
+def report_changes(report: Report, changes: list[Finding]) -> None:
+    for finding in changes:
+        report.write(finding)
+        cprint(f"{finding.change.capitalize()}: {finding.provider}:{finding.resource} [{finding.check}] {finding.message}", success=finding.status or finding.change == 'resolved', error=not finding.status and finding.change != 'resolved')
+    counts = {change: sum(finding.change == change for finding in changes) for change in ('new', 'resolved', 'changed')}
+    cprint(f"{counts['new']} New, {counts['resolved']} Resolved, {counts['changed']} Changed Findings since the Last Run", info=True)
 
 
 def gen_config(args: argparse.Namespace) -> None:
@@ -90,24 +317,106 @@ def gen_config(args: argparse.Namespace) -> None:
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser(description='A Cross Cloud Platform Automated Auditor')
-    parser.add_argument('platform', help='The Platform you want to audit', choices=platforms, type=str.lower)
+    parser.add_argument('platform', nargs='?', help='The Platform you want to audit', choices=platforms, type=str.lower)
     parser.add_argument('-b', '--bucket-name', default='', metavar='BucketName', help='The Name of Bucket/Container to Audit (Exclude to Audit All)')
-    parser.add_argument('-s', '--storage-acct-name', default='', metavar='StorageAcctName', help='The Name of Storage Account to Audit (Azure Only, Specify Container using -b if needed)')
+    parser.add_argument('-s', '--storage-acct-name', default='', metavar='StorageAcctName', help='The Name of Storage Account to Audit (Azure Only, Exclude to Audit All, Specify Container using -b if needed)')
     parser.add_argument('--aws-creds', default='', nargs=2, metavar=('AWS_Access_Key_ID', 'AWS_Secret_Access_Key'), help='AWS ID and Secret key (Space Separated)')
     parser.add_argument('--gcp-creds', '--gcp-creds-path', default='', metavar='JSON_Path', help='GCP Creds JSON File Path')
     parser.add_argument('--az-creds', default='', nargs=4, metavar=('AZ_Tenant_ID', 'AZ_Client_ID', 'AZ_Client_Secret', 'AZ_Subcription_ID'), help='Azure Service Principal Credentials and an Active Subcription ID (Space Separated)')
     parser.add_argument('--aws-creds-path', default='', metavar='JSON_Path', help='AWS Creds JSON File Path')
     parser.add_argument('--az-creds-path', default='', metavar='JSON_Path', help='Azure Creds JSON File Path')
+    parser.add_argument('--workers', default=1, type=int, metavar='N', help='Number of Concurrent Workers when Auditing All Buckets or Storage Accounts (AWS and Azure)')
+    parser.add_argument('--probe-concurrency', default=32, type=int, metavar='N', help='Number of Concurrent Unauthenticated Permission Probes (GCP Only)')
+    parser.add_argument('--timeout', default=10.0, type=float, metavar='Seconds', help='Timeout for Unauthenticated Permission Probes (GCP Only)')
+    parser.add_argument('--checks', default=[], nargs='+', metavar='Check_ID', help='Run only these Checks (IDs or Wildcards such as s3.bucket_acl or az.*)')
+    parser.add_argument('--skip-checks', default=[], nargs='+', metavar='Check_ID', help='Skip these Checks (IDs or Wildcards)')
+    parser.add_argument('--scan-objects', action='store_true', help='Also Scan the ACL of every Object in the Bucket for Public Grants (AWS Only)')
+    parser.add_argument('--max-objects', default=0, type=int, metavar='N', help='Maximum Objects Listed per Bucket in One Run of --scan-objects (0 for Unlimited)')
+    parser.add_argument('--sample-rate', default=1.0, type=float, metavar='Fraction', help='Fraction of Listed Objects whose ACL is Checked by --scan-objects')
+    parser.add_argument('--scan-state', default='', metavar='JSON_Path', help='Save the Listing Position of --scan-objects to this File and Resume from it in the Next Run')
+    parser.add_argument('--output', '-o', default='', metavar='Output_Path', help='Stream Findings to a File (JSON Lines, or SARIF if the path ends with .sarif)')
+    parser.add_argument('--output-format', default='', choices=list(Report.writers), help='Format of the Findings File (Overrides the Extension of --output)')
+    parser.add_argument('--cache-dir', default='', metavar='Cache_Dir', help='Cache Fetched Configurations in this Directory for Later Runs')
+    parser.add_argument('--cache-ttl', default=3600.0, type=float, metavar='Seconds', help='Time after which Cached Configurations are Fetched Again')
+    parser.add_argument('--incremental', action='store_true', help='Reuse Cached Configurations of Resources whose ETag has not Changed, Regardless of TTL')
+    parser.add_argument('--rate', default=0.0, type=float, metavar='Calls_Per_Second', help='Maximum Rate of Calls per Cloud API (0 for Unlimited)')
+    parser.add_argument('--max-concurrency', default=64, type=int, metavar='N', help='Upper Bound of the Adaptive Concurrency per Cloud API (Halved on Throttling)')
+    parser.add_argument('--retries', default=5, type=int, metavar='N', help='Retries with Jittered Backoff for Throttled or Transient API Errors')
+    parser.add_argument('--record', default='', metavar='Snapshot_Path', help='Record all API Responses to a Snapshot File (Compressed if the path ends with .gz)')
+    parser.add_argument('--replay', default='', metavar='Snapshot_Path', help='Run the Audit against a Recorded Snapshot File without Network Access')
+    parser.add_argument('--manifest', '-m', default='', metavar='JSON_Path', help='Audit every Target (platform, creds, name, bucket_name, storage_acct_name) Listed in a JSON Manifest in One Process')
+    parser.add_argument('--manifest-workers', default=4, type=int, metavar='N', help='Number of Manifest Targets Audited Concurrently')
+    parser.add_argument('--findings-db', default='', metavar='DB_Path', help='Keep the Latest Findings per Provider, Resource and Check in this SQLite File')
+    parser.add_argument('--diff', action='store_true', help='Emit only Findings that are New, Resolved or Changed since the Last Run (Uses --findings-db, by Default findings.db in --cache-dir or the Working Directory)')
+    parser.add_argument('--shards', default=0, type=int, metavar='N', help='Audit All Resources in Shards Run by N Worker Processes, Checkpointing every Completed Resource')
+    parser.add_argument('--shard-size', default=50, type=int, metavar='N', help='Number of Resources per Shard with --shards')
+    parser.add_argument('--checkpoint-dir', default='', metavar='Checkpoint_Dir', help='Directory of the Shard Checkpoints (Default checkpoints in --cache-dir or the Working Directory)')
+    parser.add_argument('--resume', action='store_true', help='Skip Resources Completed by an Interrupted --shards Run and Reuse their Findings')
+    parser.add_argument('--daemon', action='store_true', help='Keep Running with Warm Sessions and Re-Audit on a Schedule, Failing and Changed Resources First')
+    parser.add_argument('--interval', default=3600.0, type=float, metavar='Seconds', help='Time between the Starts of Consecutive Audit Rounds in --daemon Mode')
+    parser.add_argument('--listen', default='127.0.0.1:8787', metavar='Host:Port', help='Address Serving /findings, /status and /metrics in --daemon Mode')
+    parser.add_argument('--metrics-out', default='', metavar='Metrics_Path', help='Write Check Latency and API Call Metrics at the End of the Run (JSON if the path ends with .json, else Prometheus Text)')
+    parser.add_argument('--profile-startup', action='store_true', help='Print the Time Spent Importing the CLI and each Provider SDK')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Disable the Progress Spinner (Implied when Output is not a Terminal)')
     parser.add_argument('--gen-config', '-gc', action='store_true', help='Generate a config file for the platform for later use. Pass the values as arguments or enter interactively.')
     args = parser.parse_args()
 
+    if not args.platform and not args.manifest:
+        parser.error('the platform argument is required unless --manifest is given')
+
+    if args.shards and (args.manifest or args.daemon or args.record or args.replay or args.scan_state):
+        parser.error('--shards cannot be combined with --manifest, --daemon, --record, --replay or --scan-state')
+
+    if args.diff and args.daemon:
+        parser.error('--diff cannot be combined with --daemon, which serves current findings over HTTP')
+
     if args.gen_config:
         gen_config(args=args)
         exit(0)
 
-    if args.platform == 'aws':
-        init_s3bucket(args)
-    elif args.platform == 'gcp':
-        init_gcpbucket(args)
-    elif args.platform == 'az':
-        init_azblob(args)
+    if args.quiet or args.daemon or (args.manifest and args.manifest_workers > 1):
+        Loader.headless = True
+
+    args.scan_checkpoint = Checkpoint(args.scan_state)
+    report = Report(output_path=args.output, output_format=args.output_format)
+    cache = SnapshotCache(cache_dir=args.cache_dir, ttl=args.cache_ttl, incremental=args.incremental)
+    snapshot = Snapshot(record_path=args.record, replay_path=args.replay)
+    scheduler = Scheduler(rate=args.rate, max_concurrency=args.max_concurrency, retries=args.retries)
+    fetcher = Fetcher(cache=cache, snapshot=snapshot, scheduler=scheduler)
+    store = FindingsStore('' if args.daemon else args.findings_db or (os.path.join(args.cache_dir or '.', 'findings.db') if args.diff else ''))
+    report.listeners.append(store.add)
+    if args.diff:
+        report.streaming = False
+        Loader.muted = True
+    try:
+        if args.daemon:
+            init_daemon(args, report, fetcher)
+        elif args.manifest:
+            init_manifest(args, report, fetcher)
+        elif args.shards and not (args.bucket_name or args.storage_acct_name):
+            init_sharded(args, report, fetcher)
+        else:
+            auditor = initializers[args.platform](args, report, fetcher)
+            if auditor is not None:
+                auditor.start()
+        if not args.daemon:
+            changes = store.commit(diff_scopes(args))
+            if args.diff:
+                report_changes(report, changes)
+    except SnapshotMiss as e:
+        cprint(f"Replay Failed: {e} (Record with the Same Targets to Replay)", error=True)
+    finally:
+        if args.profile_startup:
+            profile_startup()
+        totals = scheduler.totals()
+        if totals['throttles'] or totals['retries']:
+            cprint(f"{totals['calls']} API Calls, {totals['throttles']} Throttled, {totals['retries']} Retried, {totals['errors']} Failed", info=True)
+        if args.metrics_out:
+            scheduler.metrics.write(args.metrics_out, scheduler.counters)
+            cprint("Metrics Written at Path: " + os.path.abspath(args.metrics_out), success=True)
+        store.close()
+        cache.close()
+        snapshot.close()
+        report.close()
+        if args.output:
+            cprint("Findings Written at Path: " + os.path.abspath(args.output), success=True)
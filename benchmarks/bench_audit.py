@@ -0,0 +1,121 @@
+from benchmarks.fakes import Backend, GCSEndpoint, fake_azure, fake_boto3, fake_storage
+from contextlib import redirect_stdout
+from typing import Any
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+providers = ['aws', 'gcp', 'az', 'az-all']
+
+
+class ThreadSampler():
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.peak = threading.active_count()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self) -> None:
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self) -> 'ThreadSampler':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.done.set()
+        self.thread.join()
+
+
+def build_auditor(provider: str, backend: Backend, args: argparse.Namespace) -> Any:
+    if provider == 'aws':
+        import models.s3bucket
+        models.s3bucket.boto3 = fake_boto3(backend)
+        return models.s3bucket.S3Bucket(workers=args.workers)
+    if provider == 'gcp':
+        import models.gcpbucket
+        from utils.probe import PermissionProber
+        endpoint = GCSEndpoint(backend)
+        PermissionProber.endpoint = endpoint.endpoint
+        models.gcpbucket.storage = fake_storage(backend)
+        auditor = models.gcpbucket.GCPBucket(probe_concurrency=args.workers)
+        auditor.endpoint = endpoint
+        return auditor
+    import models.azblob
+    for name, fake in fake_azure(backend).items():
+        setattr(models.azblob, name, fake)
+    storage_acct_name = '' if provider == 'az-all' else 'account-0'
+    return models.azblob.AZBlob(storage_acct_name=storage_acct_name, tenant_id='bench', client_id='bench', client_secret='bench', subscription_id='bench', workers=args.workers)
+
+
+def run_scenario(args: argparse.Namespace) -> dict[str, Any]:
+    from utils.loader import Loader
+    Loader.headless = True
+
+    accounts = args.accounts if args.provider == 'az-all' else 1
+    backend = Backend(size=max(1, args.size // accounts), latency=args.latency / 1000, accounts=accounts)
+    auditor = build_auditor(args.provider, backend, args)
+
+    with ThreadSampler() as sampler, open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        started = time.perf_counter()
+        auditor.start()
+        wall_time = time.perf_counter() - started
+
+    api_calls = backend.calls
+    if hasattr(auditor, 'endpoint'):
+        api_calls += auditor.endpoint.calls.value
+        auditor.endpoint.close()
+
+    return {
+        'provider': args.provider,
+        'resources': args.size,
+        'latency_ms': args.latency,
+        'workers': args.workers,
+        'wall_time_s': round(wall_time, 3),
+        'api_calls': api_calls,
+        'api_calls_per_resource': round(api_calls / max(1, args.size), 2),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'peak_threads': sampler.peak
+    }
+
+
+def run_suite(args: argparse.Namespace) -> None:
+    print(f"{'provider':<10}{'resources':>10}{'wall (s)':>10}{'calls/res':>11}{'rss (MB)':>10}{'threads':>9}")
+    for provider in args.providers:
+        for size in args.sizes:
+            command = [sys.executable, '-m', 'benchmarks.bench_audit', '--scenario', '--provider', provider, '--size', str(size), '--latency', str(args.latency), '--workers', str(args.workers), '--accounts', str(args.accounts)]
+            completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            if completed.returncode != 0:
+                print(f'{provider:<10}{size:>10}  failed: {completed.stderr.strip().splitlines()[-1:]}')
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{provider:<10}{size:>10}{result['wall_time_s']:>10}{result['api_calls_per_resource']:>11}{result['peak_rss_mb']:>10}{result['peak_threads']:>9}")
+            if args.json:
+                with open(args.json, 'a') as fp:
+                    fp.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark the Audit-All Paths against Local Fake Cloud Backends')
+    parser.add_argument('--providers', nargs='+', default=providers, choices=providers, help='Providers to Benchmark')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 1000, 10000], help='Number of Synthetic Resources per Run')
+    parser.add_argument('--latency', type=float, default=0.0, metavar='Milliseconds', help='Latency Injected into every Fake API Call')
+    parser.add_argument('--workers', type=int, default=1, metavar='N', help='Workers / Probe Concurrency Passed to the Auditor')
+    parser.add_argument('--accounts', type=int, default=10, metavar='N', help='Storage Accounts Listed by the Subscription-Wide Azure Scenario (az-all)')
+    parser.add_argument('--json', default='', metavar='JSON_Path', help='Append every Result as a JSON Line to this File')
+    parser.add_argument('--scenario', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--provider', default='aws', choices=providers, help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, default=10, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_scenario(args)))
+    else:
+        run_suite(args)
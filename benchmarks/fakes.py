@@ -0,0 +1,287 @@
+from botocore.exceptions import ClientError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+import datetime
+import json
+import multiprocessing
+import threading
+import time
+
+
+class Backend():
+    def __init__(self, size: int, latency: float = 0.0, accounts: int = 1) -> None:
+        self.size = size
+        self.latency = latency
+        self.accounts = accounts
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.page_size = 1000
+
+    def call(self) -> None:
+        with self.lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def names(self, prefix: str) -> Iterator[str]:
+        return (f'{prefix}-{index}' for index in range(self.size))
+
+    def pages(self, prefix: str, token: str) -> Iterator[tuple[list[str], Optional[str]]]:
+        start = int(token or 0)
+        while True:
+            self.call()
+            end = min(self.size, start + self.page_size)
+            yield [f'{prefix}-{index}' for index in range(start, end)], str(end) if end < self.size else None
+            if end >= self.size:
+                return
+            start = end
+
+    @staticmethod
+    def index(name: str) -> int:
+        return int(name.rsplit('-', 1)[1])
+
+
+def client_error(code: str, operation: str, status_code: int = 404) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status_code}}, operation)
+
+
+class FakeS3Client():
+    def __init__(self, backend: Backend) -> None:
+        self.backend = backend
+
+    def get_caller_identity(self) -> dict[str, Any]:
+        self.backend.call()
+        return {'Account': '000000000000', 'Arn': 'arn:aws:iam::000000000000:user/bench', 'UserId': 'bench'}
+
+    def list_buckets(self) -> dict[str, Any]:
+        self.backend.call()
+        created = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        return {'Buckets': [{'Name': name, 'CreationDate': created} for name in self.backend.names('bucket')]}
+
+    def get_bucket_location(self, Bucket: str) -> dict[str, Any]:
+        self.backend.call()
+        return {'LocationConstraint': [None, 'eu-west-1', 'ap-south-1'][self.backend.index(Bucket) % 3]}
+
+    def get_bucket_website(self, Bucket: str) -> dict[str, Any]:
+        self.backend.call()
+        if self.backend.index(Bucket) % 7:
+            raise client_error('NoSuchWebsiteConfiguration', 'GetBucketWebsite')
+        return {'IndexDocument': {'Suffix': 'index.html'}}
+
+    def get_bucket_encryption(self, Bucket: str) -> dict[str, Any]:
+        self.backend.call()
+        if self.backend.index(Bucket) % 3 == 0:
+            raise client_error('ServerSideEncryptionConfigurationNotFoundError', 'GetBucketEncryption')
+        return {'ServerSideEncryptionConfiguration': {'Rules': [{'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'AES256'}}]}}
+
+    def get_bucket_logging(self, Bucket: str) -> dict[str, Any]:
+        self.backend.call()
+        if self.backend.index(Bucket) % 2:
+            return {'LoggingEnabled': {'TargetBucket': 'logs', 'TargetPrefix': Bucket}}
+        return {}
+
+    def get_bucket_versioning(self, Bucket: str) -> dict[str, Any]:
+        self.backend.call()
+        if self.backend.index(Bucket) % 4 == 0:
+            return {}
+        return {'Status': 'Enabled', 'MFADelete': 'Disabled'}
+
+    def get_bucket_acl(self, Bucket: str) -> dict[str, Any]:
+        self.backend.call()
+        grants = [{'Grantee': {'Type': 'CanonicalUser', 'ID': 'owner'}, 'Permission': 'FULL_CONTROL'}]
+        if self.backend.index(Bucket) % 10 == 0:
+            grants.append({'Grantee': {'Type': 'Group', 'URI': 'http://acs.amazonaws.com/groups/global/AllUsers'}, 'Permission': 'READ'})
+        return {'Owner': {'ID': 'owner'}, 'Grants': grants}
+
+    def list_objects_v2(self, Bucket: str, MaxKeys: int = 1000, ContinuationToken: str = '') -> dict[str, Any]:
+        self.backend.call()
+        start = int(ContinuationToken or 0)
+        end = min(self.backend.size, start + MaxKeys)
+        page: dict[str, Any] = {'Contents': [{'Key': f'object-{index}', 'ETag': f'etag-{index}'} for index in range(start, end)], 'IsTruncated': end < self.backend.size}
+        if page['IsTruncated']:
+            page['NextContinuationToken'] = str(end)
+        return page
+
+    def get_object_acl(self, Bucket: str, Key: str) -> dict[str, Any]:
+        self.backend.call()
+        grants = [{'Grantee': {'Type': 'CanonicalUser', 'ID': 'owner'}, 'Permission': 'FULL_CONTROL'}]
+        if self.backend.index(Key) % 100 == 0:
+            grants.append({'Grantee': {'Type': 'Group', 'URI': 'http://acs.amazonaws.com/groups/global/AllUsers'}, 'Permission': 'READ'})
+        return {'Owner': {'ID': 'owner'}, 'Grants': grants}
+
+
+def fake_boto3(backend: Backend) -> SimpleNamespace:
+    class Session():
+        def __init__(self, **kwargs: Any) -> None:
+            self.region_name = 'us-east-1'
+
+        def client(self, service_name: str, **kwargs: Any) -> FakeS3Client:
+            return FakeS3Client(backend)
+
+    return SimpleNamespace(session=SimpleNamespace(Session=Session))
+
+
+def fake_storage(backend: Backend) -> SimpleNamespace:
+    class Bucket():
+        def __init__(self, name: str) -> None:
+            self.name = name
+            self.location = 'US'
+            self.project_number = 1
+            self.etag = f'etag-{name}'
+
+        def test_iam_permissions(self, permissions: list[str]) -> list[str]:
+            backend.call()
+            if backend.index(self.name) % 5 == 0:
+                return [perm for perm in permissions if perm.endswith('.get') or perm.endswith('.list')]
+            return list[str]()
+
+    class BucketIterator():
+        def __init__(self, page_token: Optional[str]) -> None:
+            self.next_page_token = page_token
+
+        @property
+        def pages(self) -> Iterator[list[Bucket]]:
+            for names, token in backend.pages('bucket', self.next_page_token or ''):
+                self.next_page_token = token
+                yield [Bucket(name) for name in names]
+
+        def __iter__(self) -> Iterator[Bucket]:
+            return (bucket for page in self.pages for bucket in page)
+
+    class Client():
+        @classmethod
+        def from_service_account_json(cls, path: str) -> 'Client':
+            return cls()
+
+        @classmethod
+        def create_anonymous_client(cls) -> 'Client':
+            return cls()
+
+        def list_buckets(self, page_token: Optional[str] = None) -> 'BucketIterator':
+            return BucketIterator(page_token)
+
+        def bucket(self, name: str) -> Bucket:
+            return Bucket(name)
+
+    return SimpleNamespace(Client=Client, Bucket=Bucket)
+
+
+class GCSEndpoint():
+    def __init__(self, backend: Backend) -> None:
+        context = multiprocessing.get_context('fork')
+        self.calls = context.Value('i', 0)
+        calls = self.calls
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                with calls.get_lock():
+                    calls.value += 1
+                if backend.latency:
+                    time.sleep(backend.latency)
+                url = urlparse(self.path)
+                bucket_name = url.path.split('/')[4]
+                permissions = parse_qs(url.query).get('permissions', list[str]())
+                body = json.dumps({'permissions': permissions[:1]} if backend.index(bucket_name) % 10 == 0 else {}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}/storage/v1/b/{{bucket}}/iam/testPermissions'
+        self.process = context.Process(target=self.server.serve_forever, daemon=True)
+        self.process.start()
+        self.server.socket.close()
+
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.join()
+
+
+def fake_azure(backend: Backend) -> dict[str, Any]:
+    def container_item(name: str) -> SimpleNamespace:
+        index = backend.index(name)
+        return SimpleNamespace(name=name, etag=f'etag-{name}', public_access='container' if index % 10 == 0 else None, has_immutability_policy=index % 3 == 0, last_modified=None)
+
+    class ClientSecretCredential():
+        def __init__(self, **kwargs: Any) -> None:
+            pass
+
+        def _request_token(self, *scopes: str) -> str:
+            backend.call()
+            return 'token'
+
+    class StorageAccount():
+        def __init__(self, name: str) -> None:
+            self.name = name
+            self.primary_endpoints = SimpleNamespace(blob=f'https://{name}.blob.core.windows.net/')
+
+        def as_dict(self) -> dict[str, Any]:
+            index = backend.index(self.name)
+            return {
+                'name': self.name,
+                'primary_endpoints': {'blob': self.primary_endpoints.blob},
+                'enable_https_traffic_only': index % 2 == 0,
+                'allow_shared_key_access': index % 3 == 0,
+                'allow_blob_public_access': index % 5 == 0,
+                'network_rule_set': {'default_action': 'Allow' if index % 2 else 'Deny', 'ip_rules': [{'ip_address_or_range': '10.0.0.0/8'}] if index % 4 == 0 else []},
+                'encryption': {'key_source': 'Microsoft.Storage', 'key_vault_properties': None}
+            }
+
+    class StorageManagementClient():
+        def __init__(self, credential: Any, subscription_id: str) -> None:
+            def list_accounts() -> list[StorageAccount]:
+                backend.call()
+                return [StorageAccount(f'account-{index}') for index in range(backend.accounts)]
+            self.storage_accounts = SimpleNamespace(list=list_accounts)
+
+    class ContainerPages():
+        def __init__(self, continuation_token: Optional[str]) -> None:
+            self.continuation_token = continuation_token
+            self.pages = backend.pages('container', continuation_token or '')
+
+        def __iter__(self) -> 'ContainerPages':
+            return self
+
+        def __next__(self) -> Iterator[SimpleNamespace]:
+            names, self.continuation_token = next(self.pages)
+            return (container_item(name) for name in names)
+
+    class ContainerPaged():
+        def by_page(self, continuation_token: Optional[str] = None) -> ContainerPages:
+            return ContainerPages(continuation_token)
+
+        def __iter__(self) -> Iterator[SimpleNamespace]:
+            return (container for page in self.by_page() for container in page)
+
+    class BlobServiceClient():
+        def __init__(self, account_url: str, credential: Any) -> None:
+            pass
+
+        def list_containers(self) -> 'ContainerPaged':
+            return ContainerPaged()
+
+    class ContainerClient():
+        def __init__(self, account_url: str, container_name: str, credential: Any) -> None:
+            self.container_name = container_name
+
+        def get_container_properties(self) -> SimpleNamespace:
+            backend.call()
+            return container_item(self.container_name)
+
+    return {
+        'ClientSecretCredential': ClientSecretCredential,
+        'StorageManagementClient': StorageManagementClient,
+        'BlobServiceClient': BlobServiceClient,
+        'ContainerClient': ContainerClient
+    }
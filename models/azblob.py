@@ -1,6 +1,14 @@
-from typing import Any
+from typing import Any, Iterator, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import copy
 from utils.cprint import cprint
 from utils.loader import Loader
+from utils.report import Finding, Report
+from utils.fetcher import Fetcher
+from utils.snapshot import SnapshotMiss
+from utils.inventory import Inventory, prefetched
+from utils.rules import Outcome, Rule, RuleSet
+from utils.registry import Check, CheckRegistry
 from azure.identity import ClientSecretCredential
 from azure.core.exceptions import ClientAuthenticationError
 from azure.mgmt.storage import StorageManagementClient
@@ -8,13 +16,25 @@ from azure.storage.blob import ContainerClient, BlobServiceClient
 
 
 class AZBlob():
-    def __init__(self, container_name: str = "", storage_acct_name: str = "", tenant_id: str = "", client_id: str = "", client_secret: str = "", subscription_id: str = "") -> None:
+    storage_acct_rules = [
+        Rule('az.secure_transfer', 'enable_https_traffic_only', 'truthy', severity='high', passed="Secure Transfer enabled.", failed="Secure Transfer disabled."),
+        Rule('az.shared_key_access', 'allow_shared_key_access', 'falsy', severity='medium', passed="Shared Key Access disabled.", failed="Shared Key Access enabled."),
+        Rule('az.firewall_rules', 'network_rule_set.ip_rules', 'truthy', severity='medium', passed="Firewall Rules enabled.", failed="Firewall Rules disabled."),
+        Rule('az.limit_network_access', 'network_rule_set.default_action', 'ne', 'Allow', severity='medium', passed="Network Access limited.", failed="Network Access not limited."),
+        Rule('az.customer_managed_keys', 'encryption.key_vault_properties', 'truthy', severity='low', passed="Customer Managed Keys enabled.", failed="Customer Managed Keys disabled."),
+        Rule('az.public_access_storage_acct', 'allow_blob_public_access', 'falsy', severity='high', passed="Public Access disabled.", failed="Public Access is enabled on the complete storage account.")
+    ]
+    storage_acct_checks = CheckRegistry()
+    container_checks = CheckRegistry()
+
+    def __init__(self, container_name: str = "", storage_acct_name: str = "", tenant_id: str = "", client_id: str = "", client_secret: str = "", subscription_id: str = "", report: Optional[Report] = None, fetcher: Optional[Fetcher] = None, workers: int = 1, checks: Sequence[str] = (), skip_checks: Sequence[str] = ()) -> None:
         self.container_name = container_name
         self.storage_acct_name = storage_acct_name
         self.tenant_id = tenant_id
         self.client_id = client_id
         self.client_secret = client_secret
         self.subscription_id = subscription_id
+        self.workers = max(1, workers)
 
         self.credential: ClientSecretCredential
         self.storage_mgmt: StorageManagementClient
@@ -22,13 +42,33 @@ class AZBlob():
         self.client: ContainerClient
         self.blob = ''
         self.storage_acct_properties = dict[str, Any]()
-        self.storage_containers = list[str]()
+        self.storage_containers = dict[str, dict[str, Any]]()
+        self.storage_accts = Inventory()
+        self.shard_outcomes = dict[str, list[Outcome]]()
+        self.priority = set[str]()
+        self.container_fields = ('public_access', 'has_immutability_policy')
         self.container_properties = dict[str, Any]()
+        self.report = report or Report()
+        self.fetcher = (fetcher or Fetcher()).identified(client_id)
+
+        self.storage_acct_selected = self.storage_acct_checks.select(checks, skip_checks)
+        self.container_selected = self.container_checks.select(checks, skip_checks)
+        self.enabled_checks = self.storage_acct_selected.ids | self.container_selected.ids
+        self.storage_acct_ruleset = RuleSet([rule for rule in self.storage_acct_rules if rule.check in self.enabled_checks])
+        self.storage_acct_outcomes = list[Outcome]()
+
+        self.check_severity = {rule.check: rule.severity for rule in self.storage_acct_rules}
+        self.check_severity.update({
+            'az.public_access_container': 'high',
+            'az.immutable_policy': 'low'
+        })
 
         self.loader = Loader()
 
     def validate_creds(self) -> bool:
         self.loader.load_message('Validating Credentials...')
+        if self.fetcher.replaying:
+            return True
         try:
             self.credential = ClientSecretCredential(tenant_id=self.tenant_id, client_id=self.client_id, client_secret=self.client_secret)
             token = self.credential._request_token('https://storage.azure.com/.default')
@@ -40,25 +80,52 @@ class AZBlob():
 
     def validate_container(self) -> bool:
         self.loader.load_message('Validating Container...')
+        if self.container_name in self.storage_containers:
+            return True
         try:
-            if len(self.storage_containers) < 1:
-                self.storage_containers = [str(container.name) for container in self.bs_client.list_containers()]
-            if self.container_name in self.storage_containers:
-                return True
+            for containers in self.iter_container_pages():
+                if self.container_name in containers:
+                    self.storage_containers = {self.container_name: containers[self.container_name]}
+                    return True
         except Exception as e:
             cprint(e, error=True)
             pass
         return False
 
+    def list_container_page(self, token: str) -> dict[str, Any]:
+        pages = self.bs_client.list_containers().by_page(continuation_token=token or None)
+        containers = [{'name': str(container.name), 'etag': str(container.etag), 'public_access': container.public_access, 'has_immutability_policy': container.has_immutability_policy} for container in next(pages, [])]
+        return {'Containers': containers, 'NextToken': pages.continuation_token}
+
+    def iter_container_pages(self) -> Iterator[dict[str, dict[str, Any]]]:
+        token = ''
+        while True:
+            page = self.fetcher.fetch(f'az/{self.storage_acct_name}#{token}', 'list_containers', lambda: self.list_container_page(token), cache=False)
+            yield {container['name']: container for container in page['Containers']}
+            token = page['NextToken']
+            if not token:
+                return
+
+    def list_storage_accts(self) -> list[dict[str, Any]]:
+        self.storage_mgmt = StorageManagementClient(credential=self.credential, subscription_id=self.subscription_id)
+        return [storage_acct.as_dict() for storage_acct in self.storage_mgmt.storage_accounts.list()]
+
+    def load_storage_accts(self) -> list[dict[str, Any]]:
+        return self.fetcher.fetch('az', 'storage_accounts.list', self.list_storage_accts, cache=False)
+
+    def select_storage_acct(self, storage_acct: dict[str, Any]) -> None:
+        self.storage_acct_name = str(storage_acct['name'])
+        self.storage_acct_properties = storage_acct
+        self.blob = str((storage_acct.get('primary_endpoints') or {}).get('blob') or '')
+        if self.blob and not self.fetcher.replaying:
+            self.bs_client = BlobServiceClient(account_url=self.blob, credential=self.credential)
+
     def check_storage_acct(self) -> bool:
         self.loader.load_message('Validating Storage Account...')
         try:
-            self.storage_mgmt = StorageManagementClient(credential=self.credential, subscription_id=self.subscription_id)
-            for storage_acct in self.storage_mgmt.storage_accounts.list():
-                if str(storage_acct.name) == self.storage_acct_name:
-                    self.storage_acct_properties = storage_acct.as_dict()
-                    self.blob = str(storage_acct.primary_endpoints.blob)
-                    self.bs_client = BlobServiceClient(account_url=self.blob, credential=self.credential)
+            for storage_acct in self.load_storage_accts():
+                if str(storage_acct['name']) == self.storage_acct_name:
+                    self.select_storage_acct(storage_acct)
                     return True
         except Exception as e:
             self.loader.done_message(message=e, status=False)
@@ -66,121 +133,162 @@ class AZBlob():
 
     def check_container(self) -> None:
         if self.container_name:
-            cprint(self.container_name, info=True)
+            self.loader.info_message(self.container_name)
             if not self.validate_container():
                 self.loader.done_message(message="Invalid Container Requested!", status=False)
                 return
             self.loader.done_message(message="Container Found!", status=True)
-            self.client = ContainerClient(account_url=self.blob, container_name=self.container_name, credential=self.credential)
-            self.container_properties = self.client.get_container_properties().__dict__
+            self.container_properties = self.storage_containers[self.container_name]
+            if any(field not in self.container_properties for field in self.container_fields):
+                self.container_properties = self.fetcher.fetch(f'az/{self.storage_acct_name}/{self.container_name}', 'get_container_properties', self.get_container_properties, version=self.container_properties.get('etag'))
             self.check_all_container()
 
-    def check_secure_transfer(self) -> None:
-        self.loader.load_message("Checking Secure Transfer...")
-        if 'enable_https_traffic_only' in self.storage_acct_properties:
-            if self.storage_acct_properties['enable_https_traffic_only']:
-                self.loader.done_message(message="Secure Transfer enabled.", status=True)
-                return
-
-        self.loader.done_message(message="Secure Transfer disabled.", status=False)
+    def get_container_properties(self) -> dict[str, Any]:
+        self.client = ContainerClient(account_url=self.blob, container_name=self.container_name, credential=self.credential)
+        return self.client.get_container_properties().__dict__
 
-    def check_shared_key_access(self) -> None:
-        self.loader.load_message("Checking Shared Key Access...")
-        if 'allow_shared_key_access' in self.storage_acct_properties:
-            if self.storage_acct_properties['allow_shared_key_access']:
-                self.loader.done_message(message="Shared Key Access enabled.", status=False)
-                return
-
-        self.loader.done_message(message="Shared Key Access disabled.", status=True)
-
-    def check_firewall_rules(self) -> None:
-        self.loader.load_message("Checking Firewall Rules...")
-        if 'network_rule_set' in self.storage_acct_properties:
-            if 'ip_rules' in self.storage_acct_properties['network_rule_set']:
-                if self.storage_acct_properties['network_rule_set']['ip_rules']:
-                    self.loader.done_message(message="Firewall Rules enabled.", status=True)
-                    return
-
-        self.loader.done_message(message="Firewall Rules disabled.", status=False)
-
-    def check_limit_network_access(self) -> None:
-        self.loader.load_message("Checking if Network Access is Limited...")
-        if 'network_rule_set' in self.storage_acct_properties:
-            if 'default_action' in self.storage_acct_properties['network_rule_set']:
-                if self.storage_acct_properties['network_rule_set']['default_action'] == 'Allow':
-                    self.loader.done_message(message="Network Access not limited.", status=False)
-                    return
-
-        self.loader.done_message(message="Network Access not limited.", status=True)
-
-    def check_customer_managed_keys(self) -> None:
-        self.loader.load_message("Checking Customer Managed Keys...")
-        if 'encryption' in self.storage_acct_properties:
-            if 'key_vault_properties' in self.storage_acct_properties['encryption']:
-                if self.storage_acct_properties['encryption']['key_vault_properties']:
-                    self.loader.done_message(message="Customer Managed Keys enabled.", status=True)
-                    return
-
-        self.loader.done_message(message="Customer Managed Keys disabled.", status=False)
-
-    def check_public_access_storage_acct(self) -> None:
-        self.loader.load_message("Checking Public Access on Storage Account...")
-        if 'allow_blob_public_access' in self.storage_acct_properties:
-            if self.storage_acct_properties['allow_blob_public_access']:
-                self.loader.done_message(message="Public Access is enabled on the complete storage account.", status=False)
-                return
+    def finding(self, check: str, message: str, status: bool, resource: str = "", evidence: Any = None) -> None:
+        if check not in self.enabled_checks:
+            return
+        self.loader.done_message(message=message, status=status)
+        self.report.add(Finding(provider='az', resource=resource or self.storage_acct_name, check=check, severity=self.check_severity[check], status=status, message=message, evidence=evidence))
 
-        self.loader.done_message(message="Public Access disabled.", status=True)
+    @storage_acct_checks.register(*[rule.check for rule in storage_acct_rules], needs=('storage_accounts.list', ))
+    def check_all_storage_acct(self) -> None:
+        outcomes = self.storage_acct_outcomes or self.storage_acct_ruleset.evaluate([self.storage_acct_properties])[0]
+        for outcome in outcomes:
+            rule = outcome.rule
+            self.finding(rule.check, message=rule.passed if outcome.status else rule.failed, status=outcome.status, evidence=outcome.value)
 
+    @container_checks.register('az.public_access_container', needs=('list_containers', ))
     def check_public_access_container(self) -> None:
         self.loader.load_message("Checking Public Access on Container...")
         if 'public_access' in self.container_properties:
             if self.container_properties['public_access'] == 'container':
-                self.loader.done_message(message="Public Access is enabled on the container.", status=False)
+                self.finding('az.public_access_container', message="Public Access is enabled on the container.", status=False, resource=f'{self.storage_acct_name}/{self.container_name}')
                 return
 
-        self.loader.done_message(message="Public Access disabled.", status=True)
+        self.finding('az.public_access_container', message="Public Access disabled.", status=True, resource=f'{self.storage_acct_name}/{self.container_name}')
 
+    @container_checks.register('az.immutable_policy', needs=('list_containers', ))
     def check_immutable_policy(self) -> None:
         self.loader.load_message("Checking Immutability Policy...")
         if 'has_immutability_policy' in self.container_properties:
             if not self.container_properties['has_immutability_policy']:
-                self.loader.done_message(message="No Immutability Policy on the container.", status=False)
+                self.finding('az.immutable_policy', message="No Immutability Policy on the container.", status=False, resource=f'{self.storage_acct_name}/{self.container_name}')
                 return
 
-        self.loader.done_message(message="Immutability Policy enabled.", status=True)
+        self.finding('az.immutable_policy', message="Immutability Policy enabled.", status=True, resource=f'{self.storage_acct_name}/{self.container_name}')
 
-    def check_all_storage_acct(self) -> None:
-        self.check_secure_transfer()
-        self.check_shared_key_access()
-        self.check_firewall_rules()
-        self.check_limit_network_access()
-        self.check_customer_managed_keys()
-        self.check_public_access_storage_acct()
+    def execute(self, check: Check) -> None:
+        with self.fetcher.metrics.timed('az', check.method):
+            try:
+                getattr(self, check.method)()
+            except SnapshotMiss as e:
+                resource = f'{self.storage_acct_name}/{self.container_name}' if check in self.container_checks.checks else ''
+                for check_id in check.ids:
+                    self.finding(check_id, message="Unknown Error " + str(e), status=False, resource=resource, evidence=type(e).__name__)
 
     def check_all_container(self) -> None:
-        self.check_public_access_container()
-        self.check_immutable_policy()
+        self.container_checks.run(self.container_selected, self.execute)
+
+    def audit_storage_acct(self) -> None:
+        if self.storage_acct_selected.checks:
+            self.loader.info_message('Performing Security Checks on the Storage Account!')
+            self.storage_acct_checks.run(self.storage_acct_selected, self.execute)
+
+        if not self.container_selected.checks:
+            return
+        self.loader.info_message('Performing Security Checks on the Container!')
+        try:
+            if not self.blob:
+                raise ValueError("No Blob Endpoint on the Storage Account.")
+            if self.container_name:
+                self.check_container()
+            else:
+                self.loader.info_message("No Specific Container Name Provided, Auditing All")
+                try:
+                    for containers in prefetched(self.iter_container_pages()):
+                        self.storage_containers = containers
+                        for container_name in sorted(containers, key=lambda name: f'{self.storage_acct_name}/{name}' not in self.priority):
+                            self.container_name = container_name
+                            self.check_container()
+                finally:
+                    self.container_name = ""
+        except Exception as e:
+            for check in sorted(self.container_selected.ids):
+                self.finding(check, message="Unknown Error " + str(e), status=False, evidence=getattr(e, 'error_code', None) or type(e).__name__)
+
+    def fork(self, storage_acct: dict[str, Any], outcomes: list[Outcome], buffered: bool = True) -> 'AZBlob':
+        worker = copy.copy(self)
+        worker.storage_acct_outcomes = outcomes
+        worker.loader = Loader(buffered=True) if buffered else self.loader
+        worker.storage_containers = dict[str, dict[str, Any]]()
+        worker.container_properties = dict[str, Any]()
+        worker.select_storage_acct(storage_acct)
+        return worker
+
+    def run_storage_acct(self, storage_acct: dict[str, Any], outcomes: list[Outcome]) -> list[str]:
+        worker = self.fork(storage_acct, outcomes)
+        worker.audit_storage_acct()
+        return worker.loader.lines
+
+    def check_all_storage_accts(self) -> None:
+        storage_accts = [storage_acct for _, storage_acct in self.inventory_entries()]
+        outcomes = self.storage_acct_ruleset.evaluate(storage_accts)
+        if self.workers > 1:
+            self.loader.info_message(f"Auditing {len(storage_accts)} Storage Accounts with {self.workers} Workers")
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                pending = [(storage_acct['name'], executor.submit(self.run_storage_acct, storage_acct, storage_acct_outcomes)) for storage_acct, storage_acct_outcomes in zip(storage_accts, outcomes)]
+                for name, future in pending:
+                    self.loader.info_message(name)
+                    try:
+                        for line in future.result():
+                            print(line, flush=True)
+                    except Exception as e:
+                        cprint(f"Error Auditing {name}: {e}", error=True)
+            return
+        for storage_acct, storage_acct_outcomes in zip(storage_accts, outcomes):
+            self.loader.info_message(storage_acct['name'])
+            try:
+                self.fork(storage_acct, storage_acct_outcomes, buffered=False).audit_storage_acct()
+            except Exception as e:
+                cprint(f"Error Auditing {storage_acct['name']}: {e}", error=True)
 
     def start(self) -> None:
         if not self.validate_creds():
             self.loader.done_message(message="Error in Credentials.", status=False)
             return
         self.loader.done_message(message="Credentials Validated.", status=True)
+        if not self.enabled_checks:
+            cprint("No Azure Checks Selected", error=True)
+            return
+        self.audit()
+
+    def inventory_entries(self) -> list[tuple[str, dict[str, Any]]]:
+        self.storage_accts.load((str(storage_acct['name']), storage_acct) for storage_acct in self.load_storage_accts())
+        return [(name, self.storage_accts.get(name)) for name in self.storage_accts.ordered(self.priority)]
+
+    def load_shard(self, entries: list[tuple[str, dict[str, Any]]]) -> None:
+        self.storage_accts.load(entries)
+        self.shard_outcomes = dict(zip([name for name, _ in entries], self.storage_acct_ruleset.evaluate([storage_acct for _, storage_acct in entries])))
+
+    def audit_resource(self, name: str) -> None:
+        self.loader.info_message(name)
+        self.fork(self.storage_accts.get(name), self.shard_outcomes[name], buffered=False).audit_storage_acct()
+
+    def refresh(self) -> None:
+        self.storage_containers = dict[str, dict[str, Any]]()
+        self.container_properties = dict[str, Any]()
+
+    def audit(self) -> None:
+        if not self.storage_acct_name:
+            self.loader.info_message("No Specific Storage Account Name Provided, Auditing All")
+            self.check_all_storage_accts()
+            return
 
         if not self.check_storage_acct():
             self.loader.done_message(message="Invalid Storage Account Requested!", status=False)
             return
         self.loader.done_message(message="Storage Account Validated.", status=True)
-
-        cprint('Performing Security Checks on the Storage Account!', info=True)
-        self.check_all_storage_acct()
-
-        cprint('Performing Security Checks on the Container!', info=True)
-        if self.container_name:
-            self.check_container()
-        else:
-            cprint("No Specific Container Name Provided, Auditing All", info=True)
-            for container in self.bs_client.list_containers():
-                self.container_name = container.name
-                self.check_container()
+        self.audit_storage_acct()
@@ -1,19 +1,35 @@
 from utils.loader import Loader
 from utils.cprint import cprint
+from utils.inventory import Inventory, prefetched
+from utils.report import Finding, Report
+from utils.probe import PermissionProber
+from utils.fetcher import Fetcher
+from utils.snapshot import SnapshotMiss
+from utils.registry import Check, CheckRegistry
+from typing import Any, Iterable, Iterator, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import storage
-import requests
+import json
 
 
 class GCPBucket():
-    def __init__(self, bucket_name: str = "", cred_file_path: str = "") -> None:
+    checks = CheckRegistry()
+
+    def __init__(self, bucket_name: str = "", cred_file_path: str = "", report: Optional[Report] = None, probe_concurrency: int = 32, timeout: float = 10.0, fetcher: Optional[Fetcher] = None, checks: Sequence[str] = (), skip_checks: Sequence[str] = ()) -> None:
         self.credentials = None
+        self.fetcher = fetcher or Fetcher()
 
-        if cred_file_path:
+        if self.fetcher.replaying:
+            self.client = storage.Client.create_anonymous_client()
+        elif cred_file_path:
             self.client = storage.Client.from_service_account_json(cred_file_path)
         else:
             self.client = storage.Client()
+        self.fetcher = self.fetcher.identified(getattr(getattr(self.client, '_credentials', None), 'service_account_email', ''))
 
         self.bucket_name = bucket_name
+        self.inventory = Inventory()
+        self.report = report or Report()
         self.bucket_permissions = {
             'storage.buckets.create':               'Create new buckets in a project.',
             'storage.buckets.delete':               'Delete buckets.',
@@ -33,6 +49,26 @@ class GCPBucket():
             'storage.objects.update':               'Update object metadata, excluding ACLs.'
         }
 
+        self.bucket_perms = [perm for perm in self.bucket_permissions.keys() if perm != 'storage.buckets.create' and perm != 'storage.buckets.list']
+        self.object_perms = [perm for perm in self.object_permissions.keys() if perm != 'storage.objects.getIamPolicy' and perm != 'storage.objects.setIamPolicy']
+        self.tested_perms = self.bucket_perms + self.object_perms
+        self.prober = PermissionProber(concurrency=probe_concurrency, timeout=timeout, scheduler=self.fetcher.scheduler, scope=self.fetcher.scope)
+        self.buckets = dict[str, storage.Bucket]()
+        self.auth_permissions = dict[str, set[str]]()
+        self.unauth_permissions = dict[str, set[str]]()
+        self.permission_errors = dict[tuple[str, str], Exception]()
+        self.priority = set[str]()
+
+        self.check_severity = {
+            'gcp.bucket_iam_auth': 'low',
+            'gcp.object_iam_auth': 'low',
+            'gcp.bucket_iam_unauth': 'high',
+            'gcp.object_iam_unauth': 'high'
+        }
+        self.selected = self.checks.select(checks, skip_checks)
+        self.prefetchers = {'test_iam_permissions': self.test_auth, 'testPermissions': self.probe_unauth}
+        self.prefetched = {'test_iam_permissions': self.auth_permissions, 'testPermissions': self.unauth_permissions}
+
         self.loader = Loader()
 
     def validate_bucket(self) -> bool:
@@ -40,75 +76,242 @@ class GCPBucket():
         if not self.bucket_name:
             return False
 
-        buckets = list[str]()
-        for bucket in self.client.list_buckets():
-            buckets.append(bucket.name)
-        return self.bucket_name in buckets
+        if self.bucket_name in self.inventory:
+            return True
+        if self.inventory.loaded:
+            return False
+        for page in self.iter_bucket_pages():
+            for bucket_name, metadata in page:
+                if bucket_name == self.bucket_name:
+                    self.inventory.window([(bucket_name, metadata)])
+                    return True
+        return False
+
+    def list_bucket_page(self, token: str) -> dict[str, Any]:
+        iterator = self.client.list_buckets(page_token=token or None)
+        buckets = [(bucket.name, {'location': bucket.location, 'project_number': bucket.project_number, 'etag': bucket.etag}) for bucket in next(iterator.pages, [])]
+        return {'Buckets': buckets, 'NextPageToken': iterator.next_page_token}
+
+    def iter_bucket_pages(self) -> Iterator[list[tuple[str, dict[str, Any]]]]:
+        token = ''
+        while True:
+            page = self.fetcher.fetch(f'gcp/buckets#{token}', 'list_buckets', lambda: self.list_bucket_page(token), cache=False)
+            yield [(bucket_name, metadata) for bucket_name, metadata in page['Buckets']]
+            token = page['NextPageToken']
+            if not token:
+                return
+
+    def load_inventory(self) -> Inventory:
+        if not self.inventory.loaded:
+            self.inventory.load(entry for page in self.iter_bucket_pages() for entry in page)
+        return self.inventory
+
+    def finding(self, check: str, message: str, status: bool, evidence: Any = None) -> None:
+        if check not in self.selected.ids:
+            return
+        self.loader.done_message(message=message, status=status)
+        self.report.add(Finding(provider='gcp', resource=self.bucket_name, check=check, severity=self.check_severity[check], status=status, message=message, evidence=evidence))
+
+    def bucket(self) -> storage.Bucket:
+        if self.bucket_name not in self.buckets:
+            self.buckets[self.bucket_name] = self.client.bucket(self.bucket_name)
+        return self.buckets[self.bucket_name]
+
+    def cached_permissions(self, bucket_name: str, call: str) -> Optional[set[str]]:
+        cached = self.fetcher.lookup(f'gcp/{bucket_name}', call, version=self.inventory.get(bucket_name).get('etag'))
+        return None if cached is None else set(cached)
+
+    def cache_permissions(self, bucket_name: str, call: str, permissions: set[str]) -> None:
+        self.fetcher.store(f'gcp/{bucket_name}', call, sorted(permissions), version=self.inventory.get(bucket_name).get('etag'))
+
+    def failed(self, bucket_name: str, call: str) -> None:
+        error = self.permission_errors.get((bucket_name, call))
+        if error is not None:
+            raise error
+
+    def test_auth(self) -> set[str]:
+        if self.bucket_name not in self.auth_permissions:
+            self.failed(self.bucket_name, 'test_iam_permissions')
+            permissions = self.cached_permissions(self.bucket_name, 'test_iam_permissions')
+            if permissions is None:
+                try:
+                    permissions = set(self.fetcher.scheduler.call('gcp.test_iam_permissions', lambda: self.bucket().test_iam_permissions(permissions=self.tested_perms), scope=self.fetcher.scope))
+                except Exception as e:
+                    self.permission_errors[(self.bucket_name, 'test_iam_permissions')] = e
+                    raise
+                self.fetcher.metrics.transferred('gcp.test_iam_permissions', len(json.dumps(sorted(permissions))))
+                self.cache_permissions(self.bucket_name, 'test_iam_permissions', permissions)
+            self.auth_permissions[self.bucket_name] = permissions
+        return self.auth_permissions[self.bucket_name]
+
+    def granted(self, check: str, need: str) -> Optional[set[str]]:
+        try:
+            return self.prefetchers[need]()
+        except Exception as e:
+            self.finding(check, message="Unknown Error " + str(e), status=False, evidence=type(e).__name__)
+            return None
 
+    @checks.register('gcp.bucket_iam_auth', needs=('test_iam_permissions', ))
     def check_bucket_iam_auth(self) -> None:
-        bucket_perms = [perm for perm in self.bucket_permissions.keys() if perm != 'storage.buckets.create' and perm != 'storage.buckets.list']
         self.loader.load_message('Checking for Authenticated Bucket Permissions...')
 
-        bucket_perm_check = self.client.bucket(self.bucket_name).test_iam_permissions(permissions=bucket_perms)
+        granted = self.granted('gcp.bucket_iam_auth', 'test_iam_permissions')
+        if granted is None:
+            return
+        bucket_perm_check = [perm for perm in self.bucket_perms if perm in granted]
         if bucket_perm_check:
-            self.loader.done_message(message='Found Authenticated Bucket Permissions!', status=True)
-            cprint('\t' + '\n\t'.join([self.bucket_permissions[key] for key in bucket_perm_check]), info=True, symbol=False)
+            self.finding('gcp.bucket_iam_auth', message='Found Authenticated Bucket Permissions!', status=True, evidence=bucket_perm_check)
+            self.loader.info_message('\t' + '\n\t'.join([self.bucket_permissions[key] for key in bucket_perm_check]), symbol=False)
         else:
-            self.loader.done_message(message='No Authenticated Bucket Permissions Found!', status=False)
+            self.finding('gcp.bucket_iam_auth', message='No Authenticated Bucket Permissions Found!', status=True)
 
+    @checks.register('gcp.object_iam_auth', needs=('test_iam_permissions', ))
     def check_object_iam_auth(self) -> None:
-        object_perms = [perm for perm in self.object_permissions.keys() if perm != 'storage.objects.getIamPolicy' and perm != 'storage.objects.setIamPolicy']
         self.loader.load_message('Checking for Authenticated Object Permissions...')
 
-        object_perm_check = self.client.bucket(self.bucket_name).test_iam_permissions(permissions=object_perms)
+        granted = self.granted('gcp.object_iam_auth', 'test_iam_permissions')
+        if granted is None:
+            return
+        object_perm_check = [perm for perm in self.object_perms if perm in granted]
         if object_perm_check:
-            self.loader.done_message(message='Found Authenticated Object Permissions!', status=True)
-            cprint('\t' + '\n\t'.join([self.object_permissions[key] for key in object_perm_check]), info=True, symbol=False)
+            self.finding('gcp.object_iam_auth', message='Found Authenticated Object Permissions!', status=True, evidence=object_perm_check)
+            self.loader.info_message('\t' + '\n\t'.join([self.object_permissions[key] for key in object_perm_check]), symbol=False)
         else:
-            self.loader.done_message(message='No Authenticated Object Permissions Found!', status=False)
+            self.finding('gcp.object_iam_auth', message='No Authenticated Object Permissions Found!', status=True)
 
+    def probe_unauth(self) -> set[str]:
+        if self.bucket_name not in self.unauth_permissions:
+            self.failed(self.bucket_name, 'testPermissions')
+            permissions = self.cached_permissions(self.bucket_name, 'testPermissions')
+            if permissions is None:
+                try:
+                    permissions = self.prober.probe(self.bucket_name, self.tested_perms)
+                except Exception as e:
+                    self.permission_errors[(self.bucket_name, 'testPermissions')] = e
+                    raise
+                self.cache_permissions(self.bucket_name, 'testPermissions', permissions)
+            self.unauth_permissions[self.bucket_name] = permissions
+        return self.unauth_permissions[self.bucket_name]
+
+    def probe_unauth_all(self, bucket_names: Iterable[str]) -> None:
+        pending = list[str]()
+        for bucket_name in bucket_names:
+            permissions = self.cached_permissions(bucket_name, 'testPermissions')
+            if permissions is None:
+                pending.append(bucket_name)
+            else:
+                self.unauth_permissions[bucket_name] = permissions
+        for bucket_name, permissions in self.prober.probe_all(pending, self.tested_perms).items():
+            if isinstance(permissions, Exception):
+                self.permission_errors[(bucket_name, 'testPermissions')] = permissions
+                continue
+            self.cache_permissions(bucket_name, 'testPermissions', permissions)
+            self.unauth_permissions[bucket_name] = permissions
+
+    @checks.register('gcp.bucket_iam_unauth', needs=('testPermissions', ))
     def check_bucket_iam_unauth(self) -> None:
-        bucket_perms = [f'permissions={perm}' for perm in self.bucket_permissions.keys() if perm != 'storage.buckets.create' and perm != 'storage.buckets.list']
         self.loader.load_message('Checking for Unauthenticated Bucket Permissions...')
 
-        bucket_perm_check = requests.get(f'https://www.googleapis.com/storage/v1/b/{self.bucket_name}/iam/testPermissions?{"&".join(bucket_perms)}').json()
-        if bucket_perm_check.get('permissions'):
-            self.loader.done_message(message='Found Unauthenticated Bucket Permissions!', status=True)
-            cprint('\t' + '\n\t'.join([self.bucket_permissions[key] for key in bucket_perm_check['permissions']]), info=True, symbol=False)
+        granted = self.granted('gcp.bucket_iam_unauth', 'testPermissions')
+        if granted is None:
+            return
+        bucket_perm_check = [perm for perm in self.bucket_perms if perm in granted]
+        if bucket_perm_check:
+            self.finding('gcp.bucket_iam_unauth', message='Found Unauthenticated Bucket Permissions!', status=False, evidence=bucket_perm_check)
+            self.loader.info_message('\t' + '\n\t'.join([self.bucket_permissions[key] for key in bucket_perm_check]), symbol=False)
         else:
-            self.loader.done_message(message='No Unauthenticated Bucket Permissions Found!', status=False)
+            self.finding('gcp.bucket_iam_unauth', message='No Unauthenticated Bucket Permissions Found!', status=True)
 
+    @checks.register('gcp.object_iam_unauth', needs=('testPermissions', ))
     def check_object_iam_unauth(self) -> None:
-        object_perms = [f'permissions={perm}' for perm in self.object_permissions.keys() if perm != 'storage.objects.getIamPolicy' and perm != 'storage.objects.setIamPolicy']
         self.loader.load_message('Checking for Unauthenticated Object Permissions...')
 
-        object_perm_check = requests.get(f'https://www.googleapis.com/storage/v1/b/{self.bucket_name}/iam/testPermissions?{"&".join(object_perms)}').json()
-        if object_perm_check.get('permissions'):
-            self.loader.done_message(message='Found Unauthenticated Object Permissions!', status=True)
-            cprint('\t' + '\n\t'.join([self.object_permissions[key] for key in object_perm_check['permissions']]), info=True, symbol=False)
+        granted = self.granted('gcp.object_iam_unauth', 'testPermissions')
+        if granted is None:
+            return
+        object_perm_check = [perm for perm in self.object_perms if perm in granted]
+        if object_perm_check:
+            self.finding('gcp.object_iam_unauth', message='Found Unauthenticated Object Permissions!', status=False, evidence=object_perm_check)
+            self.loader.info_message('\t' + '\n\t'.join([self.object_permissions[key] for key in object_perm_check]), symbol=False)
         else:
-            self.loader.done_message(message='No Unauthenticated Object Permissions Found!', status=False)
+            self.finding('gcp.object_iam_unauth', message='No Unauthenticated Object Permissions Found!', status=True)
+
+    def execute(self, check: Check) -> None:
+        with self.fetcher.metrics.timed('gcp', check.method):
+            try:
+                getattr(self, check.method)()
+            except SnapshotMiss as e:
+                for check_id in check.ids:
+                    self.finding(check_id, message="Unknown Error " + str(e), status=False, evidence=type(e).__name__)
+
+    def prefetch(self, need: str) -> None:
+        self.prefetchers[need]()
+
+    def prefetch_failed(self, need: str) -> None:
+        self.fetcher.metrics.prefetch_failed(f'gcp.{need}')
 
     def check_all(self) -> None:
-        self.check_bucket_iam_auth()
-        self.check_object_iam_auth()
-        self.check_bucket_iam_unauth()
-        self.check_object_iam_unauth()
+        pending = [need for need in self.selected.needs if self.bucket_name not in self.prefetched[need]]
+        if len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                self.checks.run(self.selected, self.execute, prefetch=self.prefetch, executor=executor, failed=self.prefetch_failed)
+            return
+        self.checks.run(self.selected, self.execute, prefetch=self.prefetch, failed=self.prefetch_failed)
 
     def check_bucket(self) -> None:
         if self.bucket_name:
-            cprint("Selected Bucket:", self.bucket_name, info=True)
+            self.loader.info_message(f"Selected Bucket: {self.bucket_name}")
             if not self.validate_bucket():
                 self.loader.done_message(message="Invalid Bucket Requested!", status=False)
                 return
             self.loader.done_message(message="Bucket Found!", status=True)
             self.check_all()
 
-    def start(self) -> None:
+    def validate_creds(self) -> bool:
+        return self.client is not None
+
+    def refresh(self) -> None:
+        self.inventory.window(())
+        self.buckets.clear()
+        self.auth_permissions.clear()
+        self.unauth_permissions.clear()
+        self.permission_errors.clear()
+
+    def inventory_entries(self) -> list[tuple[str, dict[str, Any]]]:
+        inventory = self.load_inventory()
+        return [(name, inventory.get(name)) for name in inventory.ordered(self.priority)]
+
+    def load_shard(self, entries: list[tuple[str, dict[str, Any]]]) -> None:
+        self.inventory.load(entries)
+        if 'testPermissions' in self.selected.needs:
+            self.probe_unauth_all(self.inventory)
+
+    def audit_resource(self, name: str) -> None:
+        self.bucket_name = name
+        try:
+            self.check_bucket()
+        finally:
+            self.bucket_name = ""
+
+    def audit(self) -> None:
         if self.bucket_name:
             self.check_bucket()
         else:
-            cprint("No Specific Bucket Name Provided, Auditing All", info=True)
-            for bucket in self.client.list_buckets():
-                self.bucket_name = bucket.name
-                self.check_bucket()
+            self.loader.info_message("No Specific Bucket Name Provided, Auditing All")
+            try:
+                for page in prefetched(self.iter_bucket_pages()):
+                    self.refresh()
+                    self.inventory.window(page)
+                    if 'testPermissions' in self.selected.needs:
+                        self.probe_unauth_all(self.inventory)
+                    for bucket_name in self.inventory.ordered(self.priority):
+                        self.bucket_name = bucket_name
+                        self.check_bucket()
+            finally:
+                self.bucket_name = ""
+
+    def start(self) -> None:
+        if not self.selected.checks:
+            cprint("No GCP Checks Selected", error=True)
+            return
+        self.audit()
@@ -1,20 +1,54 @@
 from utils.loader import Loader
 from utils.cprint import cprint
+from utils.inventory import Inventory
+from utils.report import Finding, Report
+from utils.fetcher import Fetcher
+from utils.scheduler import classify
+from utils.snapshot import SnapshotMiss
+from utils.clientpool import ClientPool
+from utils.checkpoint import Checkpoint
+from utils.registry import Check, CheckRegistry, Responses
+from typing import Any, Iterator, Optional, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+import copy
+import threading
+import zlib
 import boto3
 import boto3.session
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 
 class S3Bucket():
-    def __init__(self, bucket_name: str = "", aws_access_key_id: str = "", aws_secret_access_key: str = "") -> None:
+    checks = CheckRegistry()
+
+    def __init__(self, bucket_name: str = "", aws_access_key_id: str = "", aws_secret_access_key: str = "", workers: int = 1, report: Optional[Report] = None, fetcher: Optional[Fetcher] = None, scan_objects: bool = False, max_objects: int = 0, sample_rate: float = 1.0, scan_state: Optional[Checkpoint] = None, checks: Sequence[str] = (), skip_checks: Sequence[str] = ()) -> None:
         if aws_access_key_id and aws_secret_access_key:
             self.session = boto3.session.Session(aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key)
         else:
             self.session = boto3.session.Session()
 
-        self.s3 = self.session.client('s3')
+        self.workers = max(1, workers)
+        config = Config(max_pool_connections=max(10, self.workers), retries={'mode': 'standard', 'total_max_attempts': 1})
+        self.s3 = self.session.client('s3', config=config)
+        self.clients = ClientPool(self.session, 's3', config=config)
+        self.region_aliases = {None: 'us-east-1', '': 'us-east-1', 'EU': 'eu-west-1'}
+        self.region_locks = dict[str, threading.Lock]()
 
         self.bucket_name = bucket_name
+        self.inventory = Inventory()
+        self.report = report or Report()
+        self.fetcher = fetcher or Fetcher()
+        self.responses = Responses()
+        self.priority = set[str]()
+
+        self.selected = self.checks.select(checks, skip_checks, optional=('s3.object_acl', ) if scan_objects else ())
+        self.max_objects = max(0, max_objects)
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.scan_state = scan_state or Checkpoint()
+        self.object_executor: Optional[ThreadPoolExecutor] = None
+        if 's3.object_acl' in self.selected.ids:
+            self.object_executor = ThreadPoolExecutor(max_workers=self.workers)
 
         self.bucket_acl_map = {
             "READ": "%s can List Objects in the Bucket",
@@ -23,16 +57,35 @@ class S3Bucket():
             "WRITE_ACP": "%s can Modify the Bucket ACL",
             "FULL_CONTROL": "%s has Full Control on the Bucket"
         }
+        self.object_acl_map = {
+            "READ": "%s can Read the Object",
+            "WRITE": "%s can Overwrite the Object",
+            "READ_ACP": "%s can Read the Object ACL",
+            "WRITE_ACP": "%s can Modify the Object ACL",
+            "FULL_CONTROL": "%s has Full Control on the Object"
+        }
+        self.check_severity = {
+            's3.static_website': 'medium',
+            's3.server_encryption': 'high',
+            's3.logging': 'medium',
+            's3.versioning': 'low',
+            's3.mfa_delete': 'low',
+            's3.bucket_acl': 'high',
+            's3.object_acl': 'high'
+        }
 
         self.loader = Loader()
 
     def validate_creds(self) -> bool:
+        if self.fetcher.replaying:
+            return True
         sts = self.session.client('sts')
         try:
             ident = sts.get_caller_identity()
             if not ident:
                 return False
             else:
+                self.fetcher = self.fetcher.identified(ident['Arn'])
                 return True
         except ClientError as e:
             cprint(e.response['Error']['Code'], error=True)
@@ -43,70 +96,119 @@ class S3Bucket():
         if not self.bucket_name:
             return False
 
-        buckets = list[str]()
-        for bucket in self.s3.list_buckets()['Buckets']:
-            buckets.append(bucket['Name'])
-        return self.bucket_name in buckets
+        return self.bucket_name in self.load_inventory()
+
+    def load_inventory(self) -> Inventory:
+        if not self.inventory.loaded:
+            buckets = self.fetcher.fetch('aws', 'list_buckets', lambda: self.s3.list_buckets()['Buckets'], cache=False)
+            self.inventory.load((bucket['Name'], {'creation_date': bucket.get('CreationDate'), 'region': bucket.get('BucketRegion')}) for bucket in buckets)
+        return self.inventory
+
+    def regional_client(self) -> Any:
+        region = self.inventory.get(self.bucket_name).get('region')
+        if not region:
+            with self.region_locks.setdefault(self.bucket_name, threading.Lock()):
+                region = self.inventory.get(self.bucket_name).get('region')
+                if not region:
+                    try:
+                        location = self.fetch('get_bucket_location').get('LocationConstraint')
+                    except ClientError:
+                        return self.s3
+                    region = self.region_aliases.get(location, location)
+                    self.inventory.update(self.bucket_name, region=region)
+        return self.clients.get(region)
+
+    def request(self, call: str, **params: Any) -> dict[str, Any]:
+        client = self.s3 if call == 'get_bucket_location' else self.regional_client()
+        try:
+            response = getattr(client, call)(Bucket=self.bucket_name, **params)
+        except ClientError as e:
+            if classify(e) != 'fatal':
+                raise
+            return {'Error': e.response['Error']}
+        response.pop('ResponseMetadata', None)
+        return response
+
+    def fetch(self, call: str, resource: str = "", cache: bool = True, **params: Any) -> dict[str, Any]:
+        if resource:
+            response = self.fetcher.fetch(f's3/{self.bucket_name}{resource}', call, lambda: self.request(call, **params), cache=cache)
+        else:
+            response = self.responses.get(call, lambda: self.fetcher.fetch(f's3/{self.bucket_name}', call, lambda: self.request(call, **params), cache=cache))
+        if 'Error' in response:
+            raise ClientError(response, call)
+        return response
+
+    def finding(self, check: str, message: str, status: bool, evidence: Any = None, resource: str = "") -> None:
+        if check not in self.selected.ids:
+            return
+        self.loader.done_message(message=message, status=status)
+        self.report.add(Finding(provider='aws', resource=resource or self.bucket_name, check=check, severity=self.check_severity[check], status=status, message=message, evidence=evidence))
 
+    @checks.register('s3.static_website', needs=('get_bucket_website', ))
     def check_static_website(self) -> None:
         self.loader.load_message("Checking Static Website Hosting...")
         try:
-            self.s3.get_bucket_website(Bucket=self.bucket_name)
-            self.loader.done_message(message="Static Website Hosting configured.", status=False)
+            self.fetch('get_bucket_website')
+            self.finding('s3.static_website', message="Static Website Hosting configured.", status=False)
         except ClientError as e:
             if e.response['Error']['Code'] == 'NoSuchWebsiteConfiguration':
-                self.loader.done_message(message="Static Website Hosting not configured.", status=True)
+                self.finding('s3.static_website', message="Static Website Hosting not configured.", status=True)
             else:
-                self.loader.done_message(message="Unknown Error " + str(e), status=False)
+                self.finding('s3.static_website', message="Unknown Error " + str(e), status=False, evidence=e.response['Error']['Code'])
 
+    @checks.register('s3.server_encryption', needs=('get_bucket_encryption', ))
     def check_server_encyption(self) -> None:
         self.loader.load_message("Checking Server Side Encryption...")
         try:
-            self.s3.get_bucket_encryption(Bucket=self.bucket_name)
-            self.loader.done_message(message="Server Side Encryption configured.", status=True)
+            self.fetch('get_bucket_encryption')
+            self.finding('s3.server_encryption', message="Server Side Encryption configured.", status=True)
         except ClientError as e:
             if e.response['Error']['Code'] == 'ServerSideEncryptionConfigurationNotFoundError':
-                self.loader.done_message(message="Server Side Encryption not configured.", status=False)
+                self.finding('s3.server_encryption', message="Server Side Encryption not configured.", status=False)
             else:
-                self.loader.done_message(message="Unknown Error " + str(e), status=False)
+                self.finding('s3.server_encryption', message="Unknown Error " + str(e), status=False, evidence=e.response['Error']['Code'])
 
+    @checks.register('s3.logging', needs=('get_bucket_logging', ))
     def check_logging(self) -> None:
         self.loader.load_message("Checking Audit Logging...")
         try:
-            logging = self.s3.get_bucket_logging(Bucket=self.bucket_name)
+            logging = self.fetch('get_bucket_logging')
             if 'LoggingEnabled' in logging:
-                self.loader.done_message(message="Audit Logging configured.", status=True)
+                self.finding('s3.logging', message="Audit Logging configured.", status=True)
             else:
-                self.loader.done_message(message="Audit Logging not configured.", status=False)
+                self.finding('s3.logging', message="Audit Logging not configured.", status=False)
         except ClientError as e:
-            self.loader.done_message(message="Unknown Error " + str(e), status=False)
+            self.finding('s3.logging', message="Unknown Error " + str(e), status=False, evidence=e.response['Error']['Code'])
 
+    @checks.register('s3.versioning', 's3.mfa_delete', needs=('get_bucket_versioning', ))
     def check_versioning_mfa(self) -> None:
         self.loader.load_message("Checking Object Versioning and MFA...")
         try:
-            versioning = self.s3.get_bucket_versioning(Bucket=self.bucket_name)
+            versioning = self.fetch('get_bucket_versioning')
             if 'Status' in versioning:
                 if versioning['Status'] == 'Enabled':
-                    self.loader.done_message(message="Object Versioning Enabled.", status=True)
+                    self.finding('s3.versioning', message="Object Versioning Enabled.", status=True, evidence=versioning['Status'])
                 else:
-                    self.loader.done_message(message=f"Object Versioning {versioning['Status']}.", status=False)
+                    self.finding('s3.versioning', message=f"Object Versioning {versioning['Status']}.", status=False, evidence=versioning['Status'])
             else:
-                self.loader.done_message(message="Object Versioning not configured.", status=False)
+                self.finding('s3.versioning', message="Object Versioning not configured.", status=False)
             if 'MFADelete' in versioning:
                 if versioning['MFADelete'] == 'Enabled':
-                    self.loader.done_message(message="MFA Delete Enabled.", status=True)
+                    self.finding('s3.mfa_delete', message="MFA Delete Enabled.", status=True, evidence=versioning['MFADelete'])
                 else:
-                    self.loader.done_message(message=f"MFA Delete {versioning['MFADelete']}.", status=False)
+                    self.finding('s3.mfa_delete', message=f"MFA Delete {versioning['MFADelete']}.", status=False, evidence=versioning['MFADelete'])
             else:
-                self.loader.done_message(message="MFA Delete not configured.", status=False)
+                self.finding('s3.mfa_delete', message="MFA Delete not configured.", status=False)
         except ClientError as e:
-            self.loader.done_message(message="Unknown Error " + str(e), status=False)
+            for check in ('s3.versioning', 's3.mfa_delete'):
+                self.finding(check, message="Unknown Error " + str(e), status=False, evidence=e.response['Error']['Code'])
 
+    @checks.register('s3.bucket_acl', needs=('get_bucket_acl', ))
     def check_bucket_acl(self) -> None:
         self.loader.load_message("Checking Bucket ACL...")
         status = True
         try:
-            bucket_acl = self.s3.get_bucket_acl(Bucket=self.bucket_name)
+            bucket_acl = self.fetch('get_bucket_acl')
             if 'Grants' in bucket_acl:
                 for grant in bucket_acl['Grants']:
                     grantee = grant['Grantee']
@@ -115,24 +217,126 @@ class S3Bucket():
                         group = grantee['URI'].split('/')[-1]
                         if group == "AuthenticatedUsers" or group == "AllUsers":
                             status = False
-                            self.loader.done_message(message=self.bucket_acl_map[permission] % group, status=status)
+                            self.finding('s3.bucket_acl', message=self.bucket_acl_map[permission] % group, status=status, evidence={'grantee': group, 'permission': permission})
                 if status:
-                    self.loader.done_message(message="Bucket ACLs configured properly.", status=True)
+                    self.finding('s3.bucket_acl', message="Bucket ACLs configured properly.", status=True)
             else:
-                self.loader.done_message(message="Bucket ACL not configured.", status=False)
+                self.finding('s3.bucket_acl', message="Bucket ACL not configured.", status=False)
+        except ClientError as e:
+            self.finding('s3.bucket_acl', message="Unknown Error " + str(e), status=False, evidence=e.response['Error']['Code'])
+
+    def list_objects_page(self, token: str, max_keys: int) -> dict[str, Any]:
+        params: dict[str, Any] = {'MaxKeys': max_keys}
+        if token:
+            params['ContinuationToken'] = token
+        page = self.request('list_objects_v2', **params)
+        if 'Error' in page:
+            return page
+        return {'Keys': [obj['Key'] for obj in page.get('Contents', [])], 'NextContinuationToken': page.get('NextContinuationToken') if page.get('IsTruncated') else None}
+
+    def iter_object_pages(self) -> Iterator[tuple[list[str], Optional[str]]]:
+        token = self.scan_state.get(self.bucket_name) or ''
+        remaining = self.max_objects or None
+        while remaining is None or remaining > 0:
+            max_keys = 1000 if remaining is None else min(1000, remaining)
+            page = self.fetcher.fetch(f's3/{self.bucket_name}#{token}', 'list_objects_v2', lambda: self.list_objects_page(token, max_keys), cache=False)
+            if 'Error' in page:
+                raise ClientError(page, 'list_objects_v2')
+            yield page['Keys'], page['NextContinuationToken']
+            token = page['NextContinuationToken']
+            if not token:
+                return
+            if remaining is not None:
+                remaining -= len(page['Keys'])
+
+    def sampled(self, key: str) -> bool:
+        return self.sample_rate >= 1.0 or zlib.crc32(key.encode()) % 10000 < self.sample_rate * 10000
+
+    def public_object_grants(self, key: str) -> Optional[list[tuple[str, str]]]:
+        try:
+            object_acl = self.fetch('get_object_acl', resource=f'/{key}', cache=False, Key=key)
+        except ClientError:
+            return None
+        grants = list[tuple[str, str]]()
+        for grant in object_acl.get('Grants', []):
+            grantee = grant['Grantee']
+            if grantee['Type'] == 'Group':
+                group = grantee['URI'].split('/')[-1]
+                if group == "AuthenticatedUsers" or group == "AllUsers":
+                    grants.append((group, grant['Permission']))
+        return grants
+
+    @checks.register('s3.object_acl', default=False)
+    def check_object_acls(self) -> None:
+        self.loader.load_message("Scanning Object ACLs...")
+        scanned = exposed = unreadable = 0
+        try:
+            for keys, token in self.iter_object_pages():
+                keys = [key for key in keys if self.sampled(key)]
+                results = self.object_executor.map(self.public_object_grants, keys) if self.object_executor else map(self.public_object_grants, keys)
+                for key, grants in zip(keys, results):
+                    if grants is None:
+                        unreadable += 1
+                        continue
+                    for group, permission in grants:
+                        self.finding('s3.object_acl', message=f"{key}: " + self.object_acl_map[permission] % group, status=False, evidence={'grantee': group, 'permission': permission}, resource=f'{self.bucket_name}/{key}')
+                    exposed += bool(grants)
+                scanned += len(keys)
+                if token:
+                    self.scan_state.set(self.bucket_name, token)
+                else:
+                    self.scan_state.delete(self.bucket_name)
         except ClientError as e:
-            self.loader.done_message(message="Unknown Error " + str(e), status=False)
+            self.finding('s3.object_acl', message="Unknown Error " + str(e), status=False, evidence=e.response['Error']['Code'])
+            return
+        self.finding('s3.object_acl', message=f"{scanned} Objects Scanned, {exposed} Public, {unreadable} Unreadable.", status=exposed == 0, evidence={'scanned': scanned, 'public': exposed, 'unreadable': unreadable})
+
+    def execute(self, check: Check) -> None:
+        with self.fetcher.metrics.timed('aws', check.method):
+            try:
+                getattr(self, check.method)()
+            except SnapshotMiss as e:
+                for check_id in check.ids:
+                    self.finding(check_id, message="Unknown Error " + str(e), status=False, evidence=type(e).__name__)
 
     def check_all(self) -> None:
-        self.check_static_website()
-        self.check_server_encyption()
-        self.check_logging()
-        self.check_versioning_mfa()
-        self.check_bucket_acl()
+        self.responses = Responses()
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for lines in self.checks.run(self.selected, lambda check: self.run_check(self.bucket_name, check, self.responses), executor=executor):
+                    for line in lines:
+                        print(line, flush=True)
+            return
+        self.checks.run(self.selected, self.execute)
+
+    def fork(self, bucket_name: str, responses: Optional[Responses] = None) -> 'S3Bucket':
+        worker = copy.copy(self)
+        worker.bucket_name = bucket_name
+        worker.responses = responses or Responses()
+        worker.loader = Loader(buffered=True)
+        return worker
+
+    def run_check(self, bucket_name: str, check: Check, responses: Responses) -> list[str]:
+        worker = self.fork(bucket_name, responses)
+        worker.execute(check)
+        return worker.loader.lines
+
+    def submit_checks(self, executor: ThreadPoolExecutor, bucket_name: str) -> list[Future[list[str]]]:
+        responses = Responses()
+        return [executor.submit(self.run_check, bucket_name, check, responses) for check in self.selected.checks]
+
+    def check_all_concurrent(self, bucket_names: list[str]) -> None:
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = [(name, self.submit_checks(executor, name)) for name in bucket_names]
+            for name, futures in pending:
+                self.loader.info_message(name)
+                for future in futures:
+                    for line in future.result():
+                        print(line, flush=True)
 
     def check_bucket(self) -> None:
         if self.bucket_name:
-            cprint(self.bucket_name, info=True)
+            self.loader.info_message(self.bucket_name)
             if not self.validate_bucket():
                 self.loader.done_message(message="Invalid Bucket Requested!", status=False)
                 return
@@ -143,11 +347,46 @@ class S3Bucket():
         if not self.validate_creds():
             cprint("Error in Credentials", error=True)
             return
+        if not self.selected.checks:
+            cprint("No AWS Checks Selected", error=True)
+            return
+
+        try:
+            self.audit()
+        finally:
+            if self.object_executor:
+                self.object_executor.shutdown()
+
+    def refresh(self) -> None:
+        self.inventory.loaded = False
+
+    def inventory_entries(self) -> list[tuple[str, dict[str, Any]]]:
+        inventory = self.load_inventory()
+        return [(name, inventory.get(name)) for name in inventory.ordered(self.priority)]
 
+    def load_shard(self, entries: list[tuple[str, dict[str, Any]]]) -> None:
+        self.inventory.load(entries)
+
+    def audit_resource(self, name: str) -> None:
+        self.bucket_name = name
+        try:
+            self.check_bucket()
+        finally:
+            self.bucket_name = ""
+
+    def audit(self) -> None:
         if self.bucket_name:
             self.check_bucket()
         else:
-            cprint("No Specific Bucket Name Provided, Auditing All", info=True)
-            for bucket in self.s3.list_buckets()['Buckets']:
-                self.bucket_name = bucket['Name']
-                self.check_bucket()
+            self.loader.info_message("No Specific Bucket Name Provided, Auditing All")
+            bucket_names = self.load_inventory().ordered(self.priority)
+            if self.workers > 1:
+                self.loader.info_message(f"Auditing {len(bucket_names)} Buckets with {self.workers} Workers")
+                self.check_all_concurrent(bucket_names)
+                return
+            try:
+                for bucket_name in bucket_names:
+                    self.bucket_name = bucket_name
+                    self.check_bucket()
+            finally:
+                self.bucket_name = ""
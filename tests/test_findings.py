@@ -0,0 +1,34 @@
+from utils.findings import FindingsStore
+from utils.report import Finding
+from pathlib import Path
+
+
+def finding(resource: str, check: str, status: bool, message: str = '', account: str = '') -> Finding:
+    return Finding(provider='aws', resource=resource, check=check, severity='high', status=status, message=message or check, account=account)
+
+
+def run(store: FindingsStore, findings: list[Finding], scopes: dict[tuple[str, str], str]) -> dict[tuple[str, str], str]:
+    for item in findings:
+        store.add(item)
+    return {(change.resource, change.check): change.change for change in store.commit(scopes)}
+
+
+def test_commit_reports_new_resolved_and_changed_findings(tmp_path: Path) -> None:
+    store = FindingsStore(str(tmp_path / 'findings.db'))
+    scopes = {('', 'aws'): ''}
+    assert run(store, [finding('bucket-0', 's3.logging', False), finding('bucket-0', 's3.bucket_acl', False), finding('bucket-1', 's3.logging', True)], scopes) == {
+        ('bucket-0', 's3.logging'): 'new', ('bucket-0', 's3.bucket_acl'): 'new', ('bucket-1', 's3.logging'): 'new'}
+    assert run(store, [finding('bucket-0', 's3.logging', False), finding('bucket-0', 's3.bucket_acl', True), finding('bucket-1', 's3.logging', True, message='Changed')], scopes) == {
+        ('bucket-0', 's3.bucket_acl'): 'resolved', ('bucket-1', 's3.logging'): 'changed'}
+    assert run(store, [finding('bucket-0', 's3.logging', False), finding('bucket-0', 's3.bucket_acl', True), finding('bucket-1', 's3.logging', True, message='Changed')], scopes) == {}
+    store.close()
+
+
+def test_commit_resolves_stale_findings_only_within_scope(tmp_path: Path) -> None:
+    store = FindingsStore(str(tmp_path / 'findings.db'))
+    run(store, [finding('bucket-0', 's3.logging', False), finding('bucket-0/key', 's3.logging', False), finding('bucket-1', 's3.logging', False), finding('bucket-0', 's3.logging', False, account='other')], {('', 'aws'): '', ('other', 'aws'): ''})
+    assert run(store, [finding('bucket-0', 's3.logging', False)], {('', 'aws'): 'bucket-0'}) == {('bucket-0/key', 's3.logging'): 'resolved'}
+    assert run(store, [finding('bucket-0', 's3.bucket_acl', False)], {('', 'aws'): ''}) == {('bucket-0', 's3.bucket_acl'): 'new'}
+    assert run(store, [finding('bucket-0', 's3.logging', False)], {('', 'aws'): ''}) == {('bucket-1', 's3.logging'): 'resolved'}
+    assert run(store, [], {('other', 'aws'): ''}) == {}
+    store.close()
@@ -0,0 +1,47 @@
+from models.azblob import AZBlob
+from utils.rules import RuleSet
+from typing import Any
+import pytest
+
+
+def legacy_status(check: str, props: dict[str, Any]) -> bool:
+    if check == 'az.secure_transfer':
+        return 'enable_https_traffic_only' in props and bool(props['enable_https_traffic_only'])
+    if check == 'az.shared_key_access':
+        return not ('allow_shared_key_access' in props and props['allow_shared_key_access'])
+    if check == 'az.firewall_rules':
+        return 'network_rule_set' in props and 'ip_rules' in props['network_rule_set'] and bool(props['network_rule_set']['ip_rules'])
+    if check == 'az.limit_network_access':
+        return not ('network_rule_set' in props and 'default_action' in props['network_rule_set'] and props['network_rule_set']['default_action'] == 'Allow')
+    if check == 'az.customer_managed_keys':
+        return 'encryption' in props and 'key_vault_properties' in props['encryption'] and bool(props['encryption']['key_vault_properties'])
+    if check == 'az.public_access_storage_acct':
+        return not ('allow_blob_public_access' in props and props['allow_blob_public_access'])
+    raise KeyError(check)
+
+
+storage_accts = [
+    {},
+    {'enable_https_traffic_only': True, 'allow_shared_key_access': True, 'allow_blob_public_access': True},
+    {'enable_https_traffic_only': False, 'allow_shared_key_access': False, 'allow_blob_public_access': False},
+    {'enable_https_traffic_only': None, 'allow_shared_key_access': None, 'allow_blob_public_access': None},
+    {'network_rule_set': {}},
+    {'network_rule_set': {'ip_rules': [], 'default_action': 'Deny'}},
+    {'network_rule_set': {'ip_rules': None, 'default_action': None}},
+    {'network_rule_set': {'ip_rules': [{'ip_address_or_range': '10.0.0.0/8'}], 'default_action': 'Allow'}},
+    {'encryption': {}},
+    {'encryption': {'key_source': 'Microsoft.Storage', 'key_vault_properties': None}},
+    {'encryption': {'key_source': 'Microsoft.Keyvault', 'key_vault_properties': {}}},
+    {'encryption': {'key_source': 'Microsoft.Keyvault', 'key_vault_properties': {'key_name': 'key'}}}
+]
+
+
+@pytest.mark.parametrize('props', storage_accts)
+def test_storage_acct_rules_match_legacy_checks(props: dict[str, Any]) -> None:
+    outcomes = RuleSet(AZBlob.storage_acct_rules).evaluate([props])[0]
+    assert {outcome.rule.check: outcome.status for outcome in outcomes} == {rule.check: legacy_status(rule.check, props) for rule in AZBlob.storage_acct_rules}
+
+
+def test_storage_acct_rules_evaluate_rows_independently() -> None:
+    outcomes = RuleSet(AZBlob.storage_acct_rules).evaluate(storage_accts)
+    assert [[outcome.status for outcome in row] for row in outcomes] == [[legacy_status(rule.check, props) for rule in AZBlob.storage_acct_rules] for props in storage_accts]
@@ -0,0 +1,59 @@
+from typing import Any, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SnapshotCache():
+    def __init__(self, cache_dir: str = "", ttl: float = 3600.0, incremental: bool = False) -> None:
+        self.ttl = ttl
+        self.incremental = incremental
+        self.lock = threading.Lock()
+        self.db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.db = sqlite3.connect(os.path.join(cache_dir, 'snapshots.db'), check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS snapshots (resource TEXT, call TEXT, version TEXT, fetched REAL, data TEXT, PRIMARY KEY (resource, call))')
+            self.evict()
+
+    def evict(self) -> None:
+        if self.db is None:
+            return
+        expiry = time.time() - self.ttl
+        with self.lock, self.db:
+            if self.incremental:
+                self.db.execute('DELETE FROM snapshots WHERE fetched < ? AND version IS NULL', (expiry, ))
+            else:
+                self.db.execute('DELETE FROM snapshots WHERE fetched < ?', (expiry, ))
+
+    def get(self, resource: str, call: str, version: Optional[str] = None) -> Optional[Any]:
+        if self.db is None:
+            return None
+        with self.lock:
+            row = self.db.execute('SELECT version, fetched, data FROM snapshots WHERE resource = ? AND call = ?', (resource, call)).fetchone()
+        if row is None or (version is not None and row[0] != version):
+            self.misses += 1
+            return None
+        if not (self.incremental and version is not None) and time.time() - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[2])
+
+    def put(self, resource: str, call: str, data: Any, version: Optional[str] = None) -> None:
+        if self.db is None:
+            return
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)', (resource, call, version, time.time(), json.dumps(data, default=str, separators=(',', ':'))))
+
+    def close(self) -> None:
+        if self.db is None:
+            return
+        with self.lock:
+            self.db.close()
+            self.db = None
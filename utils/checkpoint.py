@@ -0,0 +1,36 @@
+from typing import Any
+import json
+import os
+import threading
+
+
+class Checkpoint():
+    def __init__(self, path: str = "") -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = dict[str, Any]()
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as fp:
+                self.state = json.loads(fp.read() or '{}')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            return self.state.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        with self.lock:
+            self.state[key] = value
+            self.flush()
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            if self.state.pop(key, None) is not None:
+                self.flush()
+
+    def flush(self) -> None:
+        if not self.path:
+            return
+        with open(self.path + '.tmp', 'w') as fp:
+            fp.write(json.dumps(self.state, separators=(',', ':')))
+        os.replace(self.path + '.tmp', self.path)
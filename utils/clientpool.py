@@ -0,0 +1,20 @@
+from typing import Any
+import threading
+
+
+class ClientPool():
+    def __init__(self, session: Any, service_name: str, **client_kwargs: Any) -> None:
+        self.session = session
+        self.service_name = service_name
+        self.client_kwargs = client_kwargs
+        self.clients = dict[str, Any]()
+        self.lock = threading.Lock()
+
+    def get(self, region: str) -> Any:
+        client = self.clients.get(region)
+        if client is None:
+            with self.lock:
+                if region not in self.clients:
+                    self.clients[region] = self.session.client(self.service_name, region_name=region, **self.client_kwargs)
+                client = self.clients[region]
+        return client
@@ -0,0 +1,143 @@
+from utils.cprint import cprint
+from utils.report import Finding
+from utils.scheduler import Scheduler
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, NamedTuple
+from urllib.parse import parse_qs, urlparse
+import json
+import threading
+import time
+
+
+class Target(NamedTuple):
+    account: str
+    provider: str
+    auditor: Any
+
+
+class FindingsState():
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.findings = dict[tuple[str, str, str, str], tuple[int, list[Finding]]]()
+        self.round = 0
+        self.started = 0.0
+        self.finished = 0.0
+        self.running = False
+
+    def begin(self) -> None:
+        with self.lock:
+            self.round += 1
+            self.started = time.time()
+            self.running = True
+
+    def end(self, complete: bool = True) -> None:
+        with self.lock:
+            if complete:
+                self.findings = {key: value for key, value in self.findings.items() if value[0] == self.round}
+            self.finished = time.time()
+            self.running = False
+
+    def add(self, finding: Finding) -> None:
+        key = (finding.account, finding.provider, finding.resource, finding.check)
+        with self.lock:
+            stamp, findings = self.findings.get(key, (0, list[Finding]()))
+            if stamp != self.round:
+                findings = list[Finding]()
+            findings.append(finding)
+            self.findings[key] = (self.round, findings)
+
+    def failing(self, account: str, provider: str) -> set[str]:
+        failing = set[str]()
+        with self.lock:
+            for (finding_account, finding_provider, resource, check), (stamp, findings) in self.findings.items():
+                if finding_account == account and finding_provider == provider and not all(finding.status for finding in findings):
+                    failing.update((resource, resource.split('/', 1)[0]))
+        return failing
+
+    def current(self, filters: dict[str, str]) -> list[dict[str, Any]]:
+        status = {'pass': True, 'fail': False}.get(filters.get('status', ''))
+        with self.lock:
+            findings = [finding for _, entries in self.findings.values() for finding in entries]
+        return [finding._asdict() for finding in findings if (status is None or finding.status == status) and all(getattr(finding, field) == value for field, value in filters.items() if field in ('provider', 'account', 'resource', 'check', 'severity'))]
+
+    def status(self) -> dict[str, Any]:
+        with self.lock:
+            findings = [finding for _, entries in self.findings.values() for finding in entries]
+            return {'round': self.round, 'running': self.running, 'started': self.started, 'finished': self.finished, 'findings': len(findings), 'failed': sum(not finding.status for finding in findings)}
+
+
+class FindingsServer():
+    def __init__(self, state: FindingsState, scheduler: Scheduler, host: str = '127.0.0.1', port: int = 8787) -> None:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                if url.path == '/findings':
+                    filters = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                    self.reply(json.dumps(state.current(filters), default=str), 'application/json')
+                elif url.path == '/status':
+                    self.reply(json.dumps(state.status()), 'application/json')
+                elif url.path == '/metrics':
+                    self.reply(scheduler.metrics.prometheus(scheduler.counters), 'text/plain; version=0.0.4')
+                else:
+                    self.send_error(404)
+
+            def reply(self, body: str, content_type: str) -> None:
+                data = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Daemon():
+    def __init__(self, targets: list[Target], state: FindingsState, interval: float = 3600.0, workers: int = 1) -> None:
+        self.targets = targets
+        self.state = state
+        self.interval = interval
+        self.workers = max(1, workers)
+        self.stopped = threading.Event()
+
+    def audit(self, target: Target) -> None:
+        target.auditor.priority = self.state.failing(target.account, target.provider)
+        target.auditor.refresh()
+        target.auditor.audit()
+
+    def run_round(self) -> bool:
+        complete = True
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [(target, executor.submit(self.audit, target)) for target in self.targets]
+            for target, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    complete = False
+                    cprint(f"Error Auditing {target.account or target.provider}: {e}", error=True)
+        return complete
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            self.state.begin()
+            started = time.monotonic()
+            self.state.end(complete=self.run_round())
+            status = self.state.status()
+            cprint(f"Round {status['round']} Finished in {time.monotonic() - started:.1f}s: {status['failed']} of {status['findings']} Findings Failing", info=True)
+            self.stopped.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stop(self) -> None:
+        self.stopped.set()
@@ -0,0 +1,68 @@
+from utils.cache import SnapshotCache
+from utils.snapshot import Snapshot
+from utils.scheduler import Scheduler
+from utils.metrics import Metrics
+from typing import Any, Callable, Optional
+import copy
+import json
+
+
+class Fetcher():
+    def __init__(self, cache: Optional[SnapshotCache] = None, snapshot: Optional[Snapshot] = None, scheduler: Optional[Scheduler] = None) -> None:
+        self.cache = cache or SnapshotCache()
+        self.snapshot = snapshot or Snapshot()
+        self.scheduler = scheduler or Scheduler()
+        self.prefix = ''
+        self.identity = ''
+
+    @property
+    def metrics(self) -> Metrics:
+        return self.scheduler.metrics
+
+    @property
+    def replaying(self) -> bool:
+        return self.snapshot.replaying
+
+    def scoped(self, prefix: str) -> 'Fetcher':
+        fetcher = copy.copy(self)
+        fetcher.prefix = prefix
+        return fetcher
+
+    @property
+    def scope(self) -> str:
+        return self.identity or self.prefix
+
+    def identified(self, identity: str) -> 'Fetcher':
+        fetcher = copy.copy(self)
+        fetcher.identity = identity
+        return fetcher
+
+    def cached(self, resource: str) -> str:
+        return f'{self.identity}|{resource}' if self.identity else resource
+
+    def key(self, resource: str) -> str:
+        return f'{self.prefix}/{resource}' if self.prefix else resource
+
+    def lookup(self, resource: str, call: str, version: Optional[str] = None, cache: bool = True) -> Optional[Any]:
+        resource = self.key(resource)
+        if self.replaying:
+            return self.snapshot.replay(resource, call)
+        data = self.cache.get(self.cached(resource), call, version=version) if cache else None
+        if data is not None:
+            self.snapshot.record(resource, call, data)
+        return data
+
+    def store(self, resource: str, call: str, data: Any, version: Optional[str] = None, cache: bool = True) -> None:
+        resource = self.key(resource)
+        if cache:
+            self.cache.put(self.cached(resource), call, data, version=version)
+        self.snapshot.record(resource, call, data)
+
+    def fetch(self, resource: str, call: str, request: Callable[[], Any], version: Optional[str] = None, cache: bool = True) -> Any:
+        data = self.lookup(resource, call, version=version, cache=cache)
+        if data is None:
+            api = f"{resource.split('/', 1)[0]}.{call}"
+            data = self.scheduler.call(api, request, scope=self.scope)
+            self.metrics.transferred(api, len(json.dumps(data, default=str, separators=(',', ':'))))
+            self.store(resource, call, data, version=version, cache=cache)
+        return data
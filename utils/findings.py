@@ -0,0 +1,90 @@
+from utils.report import Finding
+from typing import Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+Key = tuple[str, str, str, str]
+
+
+class FindingsStore():
+    def __init__(self, path: str = "") -> None:
+        self.lock = threading.Lock()
+        self.db: Optional[sqlite3.Connection] = None
+        self.pending = dict[Key, list[Finding]]()
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS findings (account TEXT, provider TEXT, resource TEXT, check_id TEXT, digest TEXT, status INTEGER, data TEXT, updated REAL, PRIMARY KEY (account, provider, resource, check_id))')
+
+    def add(self, finding: Finding) -> None:
+        if self.db is None:
+            return
+        with self.lock:
+            self.pending.setdefault((finding.account, finding.provider, finding.resource, finding.check), list[Finding]()).append(finding)
+
+    @staticmethod
+    def digest(findings: list[Finding]) -> str:
+        values = sorted(json.dumps([finding.status, finding.severity, finding.message, finding.evidence], default=str, sort_keys=True) for finding in findings)
+        return hashlib.sha1('\n'.join(values).encode()).hexdigest()
+
+    @staticmethod
+    def encode(findings: list[Finding]) -> str:
+        return json.dumps([finding._asdict() for finding in findings], default=str, separators=(',', ':'))
+
+    @staticmethod
+    def decode(data: str) -> list[Finding]:
+        return [Finding(**finding) for finding in json.loads(data)]
+
+    def stored(self, db: sqlite3.Connection, scopes: dict[tuple[str, str], str]) -> dict[Key, tuple[str, int, str]]:
+        stored = dict[Key, tuple[str, int, str]]()
+        for (account, provider), prefix in {**{(account, provider): '' for account, provider, _, _ in self.pending}, **scopes}.items():
+            if prefix:
+                rows = db.execute('SELECT resource, check_id, digest, status, data FROM findings WHERE account = ? AND provider = ? AND (resource = ? OR substr(resource, 1, ?) = ?)', (account, provider, prefix, len(prefix) + 1, prefix + '/'))
+            else:
+                rows = db.execute('SELECT resource, check_id, digest, status, data FROM findings WHERE account = ? AND provider = ?', (account, provider))
+            for resource, check, digest, status, data in rows:
+                stored[(account, provider, resource, check)] = (digest, status, data)
+        return stored
+
+    def stale(self, stored: dict[Key, tuple[str, int, str]], scopes: dict[tuple[str, str], str]) -> list[tuple[Key, str, int]]:
+        executed = {(account, provider, check) for account, provider, _, check in self.pending}
+        return [(key, data, status) for key, (_, status, data) in stored.items() if key[:2] in scopes and key not in self.pending and (key[0], key[1], key[3]) in executed]
+
+    def commit(self, scopes: dict[tuple[str, str], str]) -> list[Finding]:
+        if self.db is None:
+            return list[Finding]()
+        changes = list[Finding]()
+        updates = list[tuple[str, str, str, str, str, int, str, float]]()
+        now = time.time()
+        with self.lock, self.db:
+            stored = self.stored(self.db, scopes)
+            for key, findings in self.pending.items():
+                digest = self.digest(findings)
+                row = stored.get(key)
+                if row is not None and row[0] == digest:
+                    continue
+                status = all(finding.status for finding in findings)
+                change = 'new' if row is None else 'resolved' if status and not row[1] else 'changed'
+                changes.extend(finding._replace(change=change) for finding in findings)
+                updates.append((*key, digest, int(status), self.encode(findings), now))
+
+            stale = self.stale(stored, scopes)
+            for key, data, status in stale:
+                if not status:
+                    changes.extend(finding._replace(change='resolved') for finding in self.decode(data))
+            self.db.executemany('DELETE FROM findings WHERE account = ? AND provider = ? AND resource = ? AND check_id = ?', [key for key, _, _ in stale])
+            self.db.executemany('INSERT OR REPLACE INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?)', updates)
+            self.pending.clear()
+        return changes
+
+    def close(self) -> None:
+        if self.db is None:
+            return
+        with self.lock:
+            self.db.close()
+            self.db = None
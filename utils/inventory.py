@@ -0,0 +1,83 @@
+from typing import Any, Iterable, Iterator, Optional, TypeVar
+import queue
+import threading
+
+T = TypeVar('T')
+
+
+class Inventory():
+    def __init__(self) -> None:
+        self.resources = dict[str, dict[str, Any]]()
+        self.changed = set[str]()
+        self.loaded = False
+        self.listed = False
+
+    def load(self, resources: Iterable[tuple[str, dict[str, Any]]]) -> None:
+        previous, self.resources = self.resources, dict[str, dict[str, Any]]()
+        self.changed = set[str]()
+        for name, metadata in resources:
+            known = previous.get(name)
+            self.resources[name] = metadata
+            if self.listed and (known is None or any(known.get(key) != value for key, value in metadata.items() if value is not None)):
+                self.changed.add(name)
+        self.loaded = self.listed = True
+
+    def window(self, resources: Iterable[tuple[str, dict[str, Any]]]) -> None:
+        self.resources = dict(resources)
+        self.changed = set[str]()
+        self.loaded = self.listed = False
+
+    def ordered(self, priority: Optional[set[str]] = None) -> list[str]:
+        priority = priority or set[str]()
+        return sorted(self.resources, key=lambda name: name not in priority and name not in self.changed)
+
+    def get(self, name: str) -> dict[str, Any]:
+        return self.resources.get(name, dict[str, Any]())
+
+    def update(self, name: str, **metadata: Any) -> None:
+        if name in self.resources:
+            self.resources[name].update(metadata)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.resources
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.resources)
+
+    def __len__(self) -> int:
+        return len(self.resources)
+
+
+def prefetched(pages: Iterator[T], depth: int = 1) -> Iterator[T]:
+    buffer = queue.Queue[tuple[bool, Any]](maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item: tuple[bool, Any]) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for page in pages:
+                if not put((True, page)):
+                    return
+            put((False, None))
+        except Exception as e:
+            put((False, e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            more, value = buffer.get()
+            if not more:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stopped.set()
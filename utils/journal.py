@@ -0,0 +1,57 @@
+from utils.report import Finding
+from typing import Any
+import glob
+import json
+import os
+
+
+class Journal():
+    def __init__(self, directory: str, shard: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.fp = open(os.path.join(directory, f'shard-{shard}.jsonl'), 'a')
+
+    def append(self, resource: str, findings: list[Finding]) -> None:
+        self.fp.write(json.dumps({'resource': resource, 'findings': [finding._asdict() for finding in findings]}, default=str, separators=(',', ':')) + '\n')
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+
+    def close(self) -> None:
+        self.fp.close()
+
+    @staticmethod
+    def paths(directory: str) -> list[str]:
+        return sorted(glob.glob(os.path.join(directory, 'shard-*.jsonl')))
+
+    @staticmethod
+    def begin(directory: str, params: dict[str, Any]) -> None:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'run.json'), 'w') as fp:
+            json.dump(params, fp, sort_keys=True)
+
+    @staticmethod
+    def matches(directory: str, params: dict[str, Any]) -> bool:
+        try:
+            with open(os.path.join(directory, 'run.json'), 'r') as fp:
+                return json.load(fp) == json.loads(json.dumps(params))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return not Journal.paths(directory)
+
+    @staticmethod
+    def completed(directory: str) -> dict[str, list[Finding]]:
+        completed = dict[str, list[Finding]]()
+        for path in Journal.paths(directory):
+            with open(path, 'r') as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    completed[entry['resource']] = [Finding(**finding) for finding in entry['findings']]
+        return completed
+
+    @staticmethod
+    def clear(directory: str) -> None:
+        for path in Journal.paths(directory):
+            os.remove(path)
+        if os.path.exists(os.path.join(directory, 'run.json')):
+            os.remove(os.path.join(directory, 'run.json'))
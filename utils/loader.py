@@ -1,32 +1,69 @@
 from utils.cprint import cprint
+import sys
 import threading
 from itertools import cycle
 from shutil import get_terminal_size
-import time
+from typing import Optional
 
 
 class Loader():
-    def __init__(self) -> None:
+    headless = not sys.stdout.isatty()
+    muted = False
+
+    def __init__(self, buffered: bool = False) -> None:
         self.loading_done = True
         self.loading_steps = ['|', '/', '-', '\\']
+        self.buffered = buffered
+        self.lines = list[str]()
+        self.message = ""
+        self.condition = threading.Condition()
+        self.spinner: Optional[threading.Thread] = None
 
     def load_message(self, message) -> None:
-        loading_thread = threading.Thread(target=self.loading, args=(message, ), daemon=True)
-        self.loading_done = False
-        loading_thread.start()
+        if self.buffered or self.headless or self.muted:
+            return
+        with self.condition:
+            self.message = message
+            self.loading_done = False
+            if self.spinner is None:
+                self.spinner = threading.Thread(target=self.loading, daemon=True)
+                self.spinner.start()
+            self.condition.notify()
 
     def done_message(self, message: str = "", status: bool = True) -> None:
-        self.loading_done = True
-        time.sleep(0.1)
         success = status
         error = not status
-        cols = get_terminal_size((80, 24)).columns
-        cprint(" " * cols, end="", flush=True, carriage=True)
-        cprint(f"{message}", success=success, error=error, flush=True, carriage=True)
+        if self.muted:
+            with self.condition:
+                self.loading_done = True
+            return
+        if self.buffered:
+            self.lines.append(cprint(f"{message}", success=success, error=error, carriage=False, to_print=False))
+            return
+        if self.headless:
+            cprint(f"{message}", success=success, error=error, carriage=False)
+            return
+        with self.condition:
+            self.loading_done = True
+            self.condition.notify()
+            cols = get_terminal_size((80, 24)).columns
+            cprint(" " * cols, end="", flush=True, carriage=True)
+            cprint(f"{message}", success=success, error=error, flush=True, carriage=True)
+
+    def info_message(self, message: str, symbol: bool = True) -> None:
+        if self.muted:
+            return
+        if self.buffered:
+            self.lines.append(cprint(f"{message}", info=True, symbol=symbol, carriage=False, to_print=False))
+            return
+        with self.condition:
+            cprint(f"{message}", info=True, symbol=symbol)
 
-    def loading(self, message) -> None:
-        for step in cycle(self.loading_steps):
-            if self.loading_done:
-                break
-            cprint(f'[{step}]', message, symbol=False, info=True, end="", flush=True, carriage=True)
-            time.sleep(0.1)
+    def loading(self) -> None:
+        steps = cycle(self.loading_steps)
+        with self.condition:
+            while True:
+                while self.loading_done:
+                    self.condition.wait()
+                cprint(f'[{next(steps)}]', self.message, symbol=False, info=True, end="", flush=True, carriage=True)
+                self.condition.wait(0.1)
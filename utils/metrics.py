@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+from typing import Any, Iterator
+import bisect
+import json
+import threading
+import time
+
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram():
+    def __init__(self, buckets: tuple[float, ...] = latency_buckets) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total = 0
+        cumulative = list[tuple[str, int]]()
+        for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def summary(self) -> dict[str, Any]:
+        return {'count': self.count, 'sum': round(self.sum, 6), 'mean': round(self.sum / self.count, 6) if self.count else 0.0, 'max': round(self.max, 6), 'buckets': dict(self.cumulative())}
+
+
+class Metrics():
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.checks = dict[tuple[str, str], Histogram]()
+        self.api_latency = dict[str, Histogram]()
+        self.api_bytes = dict[str, int]()
+        self.prefetch_errors = dict[str, int]()
+        self.started = time.time()
+
+    def observe(self, histograms: dict[Any, Histogram], key: Any, seconds: float) -> None:
+        with self.lock:
+            if key not in histograms:
+                histograms[key] = Histogram()
+            histograms[key].observe(seconds)
+
+    @contextmanager
+    def timed(self, provider: str, check: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(self.checks, (provider, check), time.perf_counter() - started)
+
+    def request(self, api: str, seconds: float) -> None:
+        self.observe(self.api_latency, api, seconds)
+
+    def transferred(self, api: str, size: int) -> None:
+        with self.lock:
+            self.api_bytes[api] = self.api_bytes.get(api, 0) + size
+
+    def prefetch_failed(self, need: str) -> None:
+        with self.lock:
+            self.prefetch_errors[need] = self.prefetch_errors.get(need, 0) + 1
+
+    def summary(self, counters: dict[str, dict[str, int]]) -> dict[str, Any]:
+        with self.lock:
+            return {
+                'duration_s': round(time.time() - self.started, 3),
+                'checks': {f'{provider}.{check}': histogram.summary() for (provider, check), histogram in sorted(self.checks.items())},
+                'api': {api: {**counters.get(api, {}), 'bytes': self.api_bytes.get(api, 0), 'latency': histogram.summary()} for api, histogram in sorted(self.api_latency.items())},
+                'prefetch_errors': dict(sorted(self.prefetch_errors.items()))
+            }
+
+    def prometheus(self, counters: dict[str, dict[str, int]]) -> str:
+        lines = list[str]()
+
+        def histogram(name: str, description: str, series: list[tuple[str, Histogram]]) -> None:
+            lines.extend([f'# HELP {name} {description}', f'# TYPE {name} histogram'])
+            for labels, values in series:
+                for bound, count in values.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {values.sum:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {values.count}')
+
+        def counter(name: str, description: str, series: list[tuple[str, int]]) -> None:
+            lines.extend([f'# HELP {name} {description}', f'# TYPE {name} counter'])
+            lines.extend(f'{name}{{{labels}}} {value}' for labels, value in series)
+
+        with self.lock:
+            histogram('audit_check_duration_seconds', 'Time Spent in each Check per Resource.', [(f'provider="{provider}",check="{check}"', values) for (provider, check), values in sorted(self.checks.items())])
+            histogram('audit_api_duration_seconds', 'Latency of each Cloud API Request Attempt.', [(f'api="{api}"', values) for api, values in sorted(self.api_latency.items())])
+            for key in ('calls', 'throttles', 'retries', 'errors'):
+                counter(f'audit_api_{key}_total', f'Cloud API Request Attempts ({key.capitalize()}).', [(f'api="{api}"', values[key]) for api, values in sorted(counters.items())])
+            counter('audit_api_response_bytes_total', 'Size of the Decoded Cloud API Responses.', [(f'api="{api}"', size) for api, size in sorted(self.api_bytes.items())])
+            counter('audit_prefetch_errors_total', 'Check Data Prefetches that Raised.', [(f'need="{need}"', count) for need, count in sorted(self.prefetch_errors.items())])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, counters: dict[str, dict[str, int]]) -> None:
+        with open(path, 'w') as fp:
+            if path.endswith('.json'):
+                fp.write(json.dumps(self.summary(counters), indent=2) + '\n')
+            else:
+                fp.write(self.prometheus(counters))
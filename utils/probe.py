@@ -0,0 +1,43 @@
+from utils.scheduler import Scheduler
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Union
+import asyncio
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PermissionProber():
+    endpoint = 'https://www.googleapis.com/storage/v1/b/{bucket}/iam/testPermissions'
+
+    def __init__(self, concurrency: int = 32, timeout: float = 10.0, scheduler: Optional[Scheduler] = None, scope: str = '') -> None:
+        self.concurrency = max(1, concurrency)
+        self.scheduler = scheduler or Scheduler()
+        self.scope = scope
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def request(self, bucket_name: str, permissions: list[str]) -> set[str]:
+        response = self.session.get(self.endpoint.format(bucket=bucket_name), params=[('permissions', perm) for perm in permissions], timeout=self.timeout)
+        self.scheduler.metrics.transferred('gcp.testPermissions', len(response.content))
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+        return set(response.json().get('permissions', []))
+
+    def probe(self, bucket_name: str, permissions: list[str]) -> set[str]:
+        return self.scheduler.call('gcp.testPermissions', lambda: self.request(bucket_name, permissions), scope=self.scope)
+
+    async def probe_async(self, bucket_name: str, permissions: list[str], semaphore: asyncio.Semaphore) -> set[str]:
+        async with semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.probe, bucket_name, permissions)
+
+    async def gather(self, bucket_names: list[str], permissions: list[str]) -> dict[str, Union[set[str], Exception]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self.probe_async(name, permissions, semaphore) for name in bucket_names), return_exceptions=True)
+        return {name: result for name, result in zip(bucket_names, results) if isinstance(result, (set, Exception))}
+
+    def probe_all(self, bucket_names: Iterable[str], permissions: list[str]) -> dict[str, Union[set[str], Exception]]:
+        return asyncio.run(self.gather(list(bucket_names), permissions))
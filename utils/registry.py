@@ -0,0 +1,83 @@
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Sequence
+import fnmatch
+import threading
+
+
+class Check(NamedTuple):
+    method: str
+    ids: tuple[str, ...]
+    needs: tuple[str, ...] = ()
+    default: bool = True
+
+
+class Selection(NamedTuple):
+    checks: list[Check]
+    ids: set[str]
+
+    @property
+    def needs(self) -> list[str]:
+        return list(dict.fromkeys(need for check in self.checks for need in check.needs))
+
+
+def matches(check_id: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatch.fnmatchcase(check_id, pattern) for pattern in patterns)
+
+
+class CheckRegistry():
+    def __init__(self) -> None:
+        self.checks = list[Check]()
+
+    def register(self, *ids: str, needs: Sequence[str] = (), default: bool = True) -> Callable[[Callable[..., None]], Callable[..., None]]:
+        def decorator(method: Callable[..., None]) -> Callable[..., None]:
+            self.checks.append(Check(method.__name__, ids, tuple(needs), default))
+            return method
+        return decorator
+
+    @property
+    def ids(self) -> list[str]:
+        return [check_id for check in self.checks for check_id in check.ids]
+
+    def select(self, include: Sequence[str] = (), exclude: Sequence[str] = (), optional: Sequence[str] = ()) -> Selection:
+        ids = set[str]()
+        for check in self.checks:
+            for check_id in check.ids:
+                wanted = matches(check_id, include) if include else (check.default or check_id in optional)
+                if wanted and not matches(check_id, exclude):
+                    ids.add(check_id)
+        return Selection([check for check in self.checks if ids.intersection(check.ids)], ids)
+
+    @staticmethod
+    def run(selection: Selection, execute: Callable[[Check], Any], prefetch: Optional[Callable[[str], Any]] = None, executor: Optional[Executor] = None, failed: Optional[Callable[[str], None]] = None) -> list[Any]:
+        if prefetch is not None:
+            def fetch(need: str) -> None:
+                try:
+                    prefetch(need)
+                except Exception:
+                    if failed is not None:
+                        failed(need)
+
+            if executor is None:
+                for need in selection.needs:
+                    fetch(need)
+            else:
+                list(executor.map(fetch, selection.needs))
+            return [execute(check) for check in selection.checks]
+        if executor is None:
+            return [execute(check) for check in selection.checks]
+        return [future.result() for future in [executor.submit(execute, check) for check in selection.checks]]
+
+
+class Responses():
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.locks = dict[str, threading.Lock]()
+        self.data = dict[str, Any]()
+
+    def get(self, key: str, request: Callable[[], Any]) -> Any:
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self.data:
+                self.data[key] = request()
+            return self.data[key]
@@ -0,0 +1,103 @@
+from typing import Any, Callable, IO, NamedTuple, Optional
+import copy
+import json
+import threading
+
+
+class Finding(NamedTuple):
+    provider: str
+    resource: str
+    check: str
+    severity: str
+    status: bool
+    message: str
+    evidence: Any = None
+    account: str = ''
+    change: str = ''
+
+
+class JsonLinesWriter():
+    def __init__(self, fp: IO[str]) -> None:
+        self.fp = fp
+
+    def open(self) -> None:
+        pass
+
+    def write(self, finding: Finding) -> None:
+        self.fp.write(json.dumps(finding._asdict(), default=str, separators=(',', ':')) + '\n')
+
+    def close(self) -> None:
+        self.fp.flush()
+
+
+class SarifWriter():
+    levels = {'high': 'error', 'medium': 'warning', 'low': 'note'}
+
+    def __init__(self, fp: IO[str]) -> None:
+        self.fp = fp
+        self.first = True
+
+    def open(self) -> None:
+        self.fp.write('{"$schema":"https://json.schemastore.org/sarif-2.1.0.json","version":"2.1.0","runs":[{"tool":{"driver":{"name":"AutomatedAuditor"}},"results":[')
+
+    def write(self, finding: Finding) -> None:
+        result = {
+            'ruleId': finding.check,
+            'kind': 'pass' if finding.status else 'fail',
+            'level': 'none' if finding.status else self.levels.get(finding.severity, 'warning'),
+            'message': {'text': finding.message},
+            'locations': [{'logicalLocations': [{'fullyQualifiedName': f'{finding.provider}:{finding.resource}'}]}],
+            'properties': {'severity': finding.severity, 'evidence': finding.evidence, 'account': finding.account, 'change': finding.change}
+        }
+        self.fp.write(('' if self.first else ',') + json.dumps(result, default=str, separators=(',', ':')))
+        self.first = False
+
+    def close(self) -> None:
+        self.fp.write(']}]}\n')
+        self.fp.flush()
+
+
+class Report():
+    writers = {'jsonl': JsonLinesWriter, 'sarif': SarifWriter}
+
+    def __init__(self, output_path: str = "", output_format: str = "") -> None:
+        self.lock = threading.Lock()
+        self.fp: Optional[IO[str]] = None
+        self.writer: Optional[JsonLinesWriter | SarifWriter] = None
+        self.listeners = list[Callable[[Finding], None]]()
+        self.streaming = True
+        self.account = ''
+
+        if output_path:
+            if not output_format:
+                output_format = 'sarif' if output_path.endswith('.sarif') else 'jsonl'
+            self.fp = open(output_path, 'w')
+            self.writer = self.writers[output_format](self.fp)
+            self.writer.open()
+
+    def scoped(self, account: str) -> 'Report':
+        report = copy.copy(self)
+        report.account = account
+        return report
+
+    def add(self, finding: Finding) -> None:
+        if self.account:
+            finding = finding._replace(account=self.account)
+        for listener in self.listeners:
+            listener(finding)
+        if self.streaming:
+            self.write(finding)
+
+    def write(self, finding: Finding) -> None:
+        if self.writer is None:
+            return
+        with self.lock:
+            self.writer.write(finding)
+
+    def close(self) -> None:
+        if self.writer is None or self.fp is None:
+            return
+        with self.lock:
+            self.writer.close()
+            self.fp.close()
+            self.writer = None
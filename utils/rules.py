@@ -0,0 +1,60 @@
+from typing import Any, Callable, NamedTuple
+import operator
+
+conditions: dict[str, Callable[[Any, Any], bool]] = {
+    'truthy': lambda value, expected: bool(value),
+    'falsy': lambda value, expected: not value,
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'in': lambda value, expected: value in expected,
+    'not_in': lambda value, expected: value not in expected
+}
+
+
+class Rule(NamedTuple):
+    check: str
+    path: str
+    condition: str
+    expected: Any = None
+    severity: str = 'medium'
+    passed: str = ''
+    failed: str = ''
+
+
+class Outcome(NamedTuple):
+    rule: Rule
+    status: bool
+    value: Any
+
+
+class Table():
+    def __init__(self, rows: list[dict[str, Any]]) -> None:
+        self.rows = rows
+        self.columns = dict[tuple[str, ...], list[Any]]()
+
+    @staticmethod
+    def resolve(row: Any, path: tuple[str, ...]) -> Any:
+        for key in path:
+            if not isinstance(row, dict):
+                return None
+            row = row.get(key)
+        return row
+
+    def column(self, path: tuple[str, ...]) -> list[Any]:
+        if path not in self.columns:
+            self.columns[path] = [self.resolve(row, path) for row in self.rows]
+        return self.columns[path]
+
+
+class RuleSet():
+    def __init__(self, rules: list[Rule]) -> None:
+        self.rules = rules
+        self.compiled = [(rule, tuple(rule.path.split('.')), conditions[rule.condition]) for rule in rules]
+
+    def evaluate(self, rows: list[dict[str, Any]]) -> list[list[Outcome]]:
+        table = Table(rows)
+        columns = list[list[Outcome]]()
+        for rule, path, condition in self.compiled:
+            column = table.column(path)
+            columns.append([Outcome(rule, condition(value, rule.expected), value) for value in column])
+        return [list(row) for row in zip(*columns)] if columns else [list[Outcome]() for _ in rows]
@@ -0,0 +1,139 @@
+from utils.metrics import Metrics
+from typing import Any, Callable, Optional, TypeVar
+import random
+import threading
+import time
+
+T = TypeVar('T')
+
+throttle_codes = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded', 'TooManyRequestsException', 'RequestThrottled', 'rateLimitExceeded', 'userRateLimitExceeded'}
+transient_errors = {'EndpointConnectionError', 'ConnectionClosedError', 'ReadTimeoutError', 'ConnectTimeoutError', 'ServiceRequestError', 'ServiceResponseError', 'ConnectionError', 'Timeout', 'ReadTimeout', 'ConnectTimeout'}
+
+
+def classify(error: Exception) -> str:
+    status_code: Optional[int] = None
+    response: Any = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        if response.get('Error', {}).get('Code') in throttle_codes:
+            return 'throttle'
+        status_code = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    elif response is not None:
+        status_code = getattr(response, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(error, 'status_code', None)
+    if status_code is None and isinstance(getattr(error, 'code', None), int):
+        status_code = error.code  # type: ignore[attr-defined]
+
+    if status_code == 429:
+        return 'throttle'
+    if (status_code is not None and status_code >= 500) or type(error).__name__ in transient_errors or isinstance(error, (ConnectionError, TimeoutError)):
+        return 'transient'
+    return 'fatal'
+
+
+class TokenBucket():
+    def __init__(self, rate: float = 0.0, burst: float = 0.0) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class AdaptiveLimiter():
+    def __init__(self, maximum: int = 64, minimum: int = 1) -> None:
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(self.maximum)
+        self.active = 0
+        self.condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.condition:
+            while self.active >= max(self.minimum, int(self.limit)):
+                self.condition.wait()
+            self.active += 1
+
+    def release(self, throttled: bool = False) -> None:
+        with self.condition:
+            self.active -= 1
+            if throttled:
+                self.limit = max(float(self.minimum), self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class Scheduler():
+    def __init__(self, rate: float = 0.0, max_concurrency: int = 64, retries: int = 5, base_delay: float = 0.2, max_delay: float = 20.0, metrics: Optional[Metrics] = None) -> None:
+        self.rate = rate
+        self.max_concurrency = max_concurrency
+        self.retries = max(0, retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.buckets = dict[tuple[str, str], TokenBucket]()
+        self.limiters = dict[tuple[str, str], AdaptiveLimiter]()
+        self.counters = dict[str, dict[str, int]]()
+        self.metrics = metrics or Metrics()
+
+    def lanes(self, api: str, scope: str = '') -> tuple[TokenBucket, AdaptiveLimiter, dict[str, int]]:
+        lane = (scope, api)
+        with self.lock:
+            if lane not in self.limiters:
+                self.buckets[lane] = TokenBucket(rate=self.rate)
+                self.limiters[lane] = AdaptiveLimiter(maximum=self.max_concurrency)
+            if api not in self.counters:
+                self.counters[api] = {'calls': 0, 'throttles': 0, 'retries': 0, 'errors': 0}
+            return self.buckets[lane], self.limiters[lane], self.counters[api]
+
+    def count(self, counters: dict[str, int], key: str) -> None:
+        with self.lock:
+            counters[key] += 1
+
+    def call(self, api: str, request: Callable[[], T], scope: str = '') -> T:
+        bucket, limiter, counters = self.lanes(api, scope)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            limiter.acquire()
+            self.count(counters, 'calls')
+            started = time.perf_counter()
+            try:
+                result = request()
+            except Exception as e:
+                self.metrics.request(api, time.perf_counter() - started)
+                kind = classify(e)
+                limiter.release(throttled=kind == 'throttle')
+                if kind == 'throttle':
+                    self.count(counters, 'throttles')
+                if kind == 'fatal' or attempt >= self.retries:
+                    self.count(counters, 'errors')
+                    raise
+                self.count(counters, 'retries')
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                attempt += 1
+                continue
+            self.metrics.request(api, time.perf_counter() - started)
+            limiter.release()
+            return result
+
+    def totals(self) -> dict[str, int]:
+        totals = {'calls': 0, 'throttles': 0, 'retries': 0, 'errors': 0}
+        with self.lock:
+            for counters in self.counters.values():
+                for key, value in counters.items():
+                    totals[key] += value
+        return totals
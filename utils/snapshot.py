@@ -0,0 +1,49 @@
+from typing import Any, IO, Optional
+import gzip
+import json
+import threading
+
+
+class SnapshotMiss(LookupError):
+    pass
+
+
+class Snapshot():
+    def __init__(self, record_path: str = "", replay_path: str = "") -> None:
+        self.lock = threading.Lock()
+        self.fp: Optional[IO[str]] = None
+        self.responses = dict[tuple[str, str], Any]()
+        self.replaying = bool(replay_path)
+
+        if replay_path:
+            with self.open(replay_path, 'r') as fp:
+                for line in fp:
+                    resource, call, data = json.loads(line)
+                    self.responses[(resource, call)] = data
+        if record_path:
+            self.fp = self.open(record_path, 'w')
+
+    @staticmethod
+    def open(path: str, mode: str) -> IO[str]:
+        if path.endswith('.gz'):
+            return gzip.open(path, mode + 't')
+        return open(path, mode)
+
+    def replay(self, resource: str, call: str) -> Any:
+        if (resource, call) not in self.responses:
+            raise SnapshotMiss(f'{call} for {resource} is not in the Snapshot')
+        return self.responses[(resource, call)]
+
+    def record(self, resource: str, call: str, data: Any) -> None:
+        if self.fp is None:
+            return
+        line = json.dumps([resource, call, data], default=str, separators=(',', ':'))
+        with self.lock:
+            self.fp.write(line + '\n')
+
+    def close(self) -> None:
+        if self.fp is None:
+            return
+        with self.lock:
+            self.fp.close()
+            self.fp = None